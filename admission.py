@@ -0,0 +1,130 @@
+"""
+Admission Control - memory budget for concurrent PDF extractions
+"""
+import os
+import threading
+import time
+from collections import deque
+
+# RGB page from poppler + BGR ndarray copy + detector working set, per pixel
+BYTES_PER_PIXEL = int(os.getenv("OCR_BYTES_PER_PIXEL", "12"))
+# Fixed overhead of one job (parsers, OCR text, response)
+JOB_BASE_BYTES = 64 * 1024 * 1024
+DPI_STEPS = (300, 250, 200, 150)
+
+
+class AdmissionPlan:
+    """How a job will be rasterized and what it is expected to cost"""
+
+    def __init__(self, pages, dpi, resident_pages, estimated_bytes, downgraded=False):
+        self.pages = pages
+        self.dpi = dpi
+        self.resident_pages = resident_pages
+        self.estimated_bytes = estimated_bytes
+        self.downgraded = downgraded
+
+    def report(self):
+        return {
+            "pages": self.pages,
+            "dpi": self.dpi,
+            "resident_pages": self.resident_pages,
+            "estimated_mb": round(self.estimated_bytes / 2**20, 1),
+            "downgraded": self.downgraded,
+        }
+
+
+def page_bytes(size_pt, dpi):
+    w_pt, h_pt = size_pt
+    return int(w_pt / 72 * dpi) * int(h_pt / 72 * dpi) * BYTES_PER_PIXEL
+
+
+class MemoryBudget:
+    """
+    Global memory budget shared by all extraction jobs.
+    Jobs are admitted in arrival order while their estimated cost fits in
+    the remaining budget; later jobs queue behind. A job that cannot fit
+    even alone is downgraded (fewer resident pages, then lower DPI).
+    """
+
+    def __init__(self, budget_bytes, resident_pages=4, dpi=300):
+        self.budget_bytes = budget_bytes
+        self.resident_pages = resident_pages
+        self.dpi = dpi
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._used = 0
+        self._running = 0
+        self._peak = 0
+        self._admitted = 0
+        self._wait_total = 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            int(os.getenv("OCR_MEMORY_BUDGET_MB", "2048")) * 2**20,
+            resident_pages=int(os.getenv("OCR_RESIDENT_PAGES", "4")),
+        )
+
+    # ----------------------------------------------------
+    # Cost estimation
+    # ----------------------------------------------------
+    def plan(self, page_sizes):
+        """page_sizes: [(width_pt, height_pt), ...] for the pages still to rasterize"""
+        if not page_sizes:
+            return AdmissionPlan(0, self.dpi, 0, JOB_BASE_BYTES)
+
+        largest = max(page_sizes, key=lambda s: s[0] * s[1])
+        resident = min(self.resident_pages, len(page_sizes))
+        dpi = self.dpi
+        cost = JOB_BASE_BYTES + resident * page_bytes(largest, dpi)
+        if cost <= self.budget_bytes:
+            return AdmissionPlan(len(page_sizes), dpi, resident, cost)
+
+        resident = 1
+        for dpi in (d for d in DPI_STEPS if d <= self.dpi):
+            cost = JOB_BASE_BYTES + page_bytes(largest, dpi)
+            if cost <= self.budget_bytes:
+                break
+        # Still too large at the lowest DPI: run it alone
+        cost = min(cost, self.budget_bytes)
+        return AdmissionPlan(len(page_sizes), dpi, resident, cost, downgraded=True)
+
+    # ----------------------------------------------------
+    # Admission
+    # ----------------------------------------------------
+    def acquire(self, plan):
+        """Block until the plan fits in the budget; returns the queue wait in seconds"""
+        start = time.monotonic()
+        token = object()
+        with self._cond:
+            self._queue.append(token)
+            while self._queue[0] is not token or self._used + plan.estimated_bytes > self.budget_bytes:
+                self._cond.wait()
+            self._queue.popleft()
+            self._used += plan.estimated_bytes
+            self._running += 1
+            self._peak = max(self._peak, self._used)
+            self._admitted += 1
+            waited = time.monotonic() - start
+            self._wait_total += waited
+            # The next job in line may fit as well
+            self._cond.notify_all()
+        return waited
+
+    def release(self, plan):
+        with self._cond:
+            self._used -= plan.estimated_bytes
+            self._running -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "budget_mb": round(self.budget_bytes / 2**20, 1),
+                "used_mb": round(self._used / 2**20, 1),
+                "peak_mb": round(self._peak / 2**20, 1),
+                "running": self._running,
+                "queued": len(self._queue),
+                "admitted": self._admitted,
+                "avg_wait_ms": round(1000 * self._wait_total / self._admitted, 1) if self._admitted else 0.0,
+            }
@@ -0,0 +1,184 @@
+"""
+Batch extraction CLI - backfill archives of invoice PDFs offline.
+
+    python -m batch_extract ./archive "scans/2024-*.pdf" -o results.jsonl \
+        --workers 4 --llm --dump-dir ocr_dumps
+
+Each PDF is processed by a pool of OCR worker processes and written as one
+JSONL record. Re-running with the same output file skips PDFs that already
+have a successful record.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+_ocr = None
+_llm = None
+
+
+def find_pdfs(inputs):
+    """Expand directories (recursively) and glob patterns into a sorted list of PDFs"""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                found.update(os.path.join(root, f) for f in files if f.lower().endswith(".pdf"))
+        else:
+            found.update(p for p in glob.glob(item, recursive=True) if p.lower().endswith(".pdf"))
+    return sorted(os.path.abspath(p) for p in found)
+
+
+def load_done(output_path):
+    """Files that already have a successful record in the output JSONL"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # truncated last line of an interrupted run
+            if record.get("status") == "success":
+                done.add(record["file"])
+    return done
+
+
+def dump_paths(pdfs, dump_dir):
+    """
+    {pdf: dump file}: the PDF's path below the inputs' common directory,
+    mirrored under ``dump_dir`` (same-named scans in different folders
+    must not overwrite each other's dump)
+    """
+    if not pdfs:
+        return {}
+    root = os.path.commonpath([os.path.dirname(p) for p in pdfs])
+    return {p: os.path.join(dump_dir, os.path.splitext(os.path.relpath(p, root))[0] + ".ocr.txt") for p in pdfs}
+
+
+def dump_pages(pages, dump_path):
+    os.makedirs(os.path.dirname(dump_path) or ".", exist_ok=True)
+    with open(dump_path, "w", encoding="utf-8") as f:
+        for page in pages:
+            for l in sorted(page["lines"], key=lambda l: (l["y"], l["x"])):
+                f.write(f"P{page['index']}|{page['type']}|Y{l['y']:.1f}|X{l['x']:.1f}|{l['text']}\n")
+
+
+# ----------------------------------------------------
+# Worker process
+# ----------------------------------------------------
+def _init_worker(poppler_path, use_llm, model_name):
+    global _ocr, _llm
+    from tracing import configure_logging
+    configure_logging()
+    from ocr_service import OCRService
+    _ocr = OCRService(poppler_path=poppler_path)
+    if use_llm:
+        from llm_service import LLMService
+        _llm = LLMService(model_name=model_name)
+
+
+def process_file(pdf_path, dump_path=None):
+    from tracing import start_trace
+    trace_id = start_trace()
+    start = time.perf_counter()
+    stats = {}
+    try:
+        invoices = _ocr.extract_invoices_from_pdf(pdf_path, stats=stats)
+        timings = stats.get("timings", {})
+        results = []
+        for inv in invoices:
+            entry = {"layout_detected": inv["layout"], "pages": inv["pages"], "invoice_number": inv["invoice_no"]}
+            if _llm is not None:
+                t0 = time.perf_counter()
+                entry["data"] = _llm.refine_extraction(
+                    inv["full_text"], inv["vehicles"], inv["layout"], invoice_no_from_ocr=inv["invoice_no"]
+                )
+                timings["llm"] = timings.get("llm", 0.0) + time.perf_counter() - t0
+            else:
+                entry["vehicles"] = inv["vehicles"]
+            results.append(entry)
+
+        if dump_path:
+            dump_pages(stats.get("pages", []), dump_path)
+
+        record = {"file": pdf_path, "status": "success", "trace_id": trace_id, "pages": len(stats.get("pages", [])),
+                  "invoices": results}
+    except Exception as e:
+        timings = stats.get("timings", {})
+        record = {"file": pdf_path, "status": "error", "trace_id": trace_id, "message": f"{type(e).__name__}: {e}", "pages": 0}
+
+    timings["total"] = time.perf_counter() - start
+    record["timings"] = {k: round(v, 3) for k, v in timings.items()}
+    return record
+
+
+# ----------------------------------------------------
+# Driver
+# ----------------------------------------------------
+def print_summary(records, wall_time, out=sys.stderr):
+    ok = [r for r in records if r["status"] == "success"]
+    pages = sum(r["pages"] for r in ok)
+    stages = {}
+    for r in ok:
+        for stage, sec in r["timings"].items():
+            stages[stage] = stages.get(stage, 0.0) + sec
+
+    print(f"Files: {len(records)} processed, {len(ok)} ok, {len(records) - len(ok)} failed", file=out)
+    print(f"Pages: {pages} in {wall_time:.1f}s wall", file=out)
+    if wall_time > 0:
+        print(f"Throughput: {len(ok) / wall_time:.2f} files/s, {pages / wall_time:.2f} pages/s", file=out)
+    for stage, sec in sorted(stages.items()):
+        per_page = f", {1000 * sec / pages:.0f} ms/page" if pages else ""
+        print(f"  {stage:<10} {sec:9.1f}s worker time{per_page}", file=out)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m batch_extract", description="Batch invoice extraction")
+    ap.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    ap.add_argument("-o", "--output", default="results.jsonl", help="JSONL output (appended, used to resume)")
+    ap.add_argument("-w", "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                    help="OCR worker processes")
+    ap.add_argument("--llm", action="store_true", help="Refine each invoice with the LLM")
+    ap.add_argument("--model", default=os.getenv("OLLAMA_MODEL", "llama3:8b"))
+    ap.add_argument("--dump-dir", help="Write per-page OCR dumps (P|type|Y|X|text) here")
+    ap.add_argument("--poppler-path", default=os.getenv("POPPLER_PATH"))
+    ap.add_argument("--no-resume", action="store_true", help="Re-process files already in the output")
+    args = ap.parse_args(argv)
+
+    pdfs = find_pdfs(args.inputs)
+    done = set() if args.no_resume else load_done(args.output)
+    todo = [p for p in pdfs if p not in done]
+    print(f"Found {len(pdfs)} PDFs, {len(pdfs) - len(todo)} already done, {len(todo)} to process",
+          file=sys.stderr)
+    if not todo:
+        return 0
+    # Computed over every PDF found, so a resumed run keeps the same dump names
+    dumps = dump_paths(pdfs, args.dump_dir) if args.dump_dir else {}
+
+    records = []
+    start = time.perf_counter()
+    with open(args.output, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.poppler_path, args.llm, args.model),
+    ) as pool:
+        futures = [pool.submit(process_file, p, dumps.get(p)) for p in todo]
+        for n, fut in enumerate(as_completed(futures), 1):
+            record = fut.result()
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            records.append(record)
+            print(f"[{n}/{len(todo)}] {record['status']:<7} {os.path.basename(record['file'])} "
+                  f"({record['timings'].get('total', 0):.1f}s)", file=sys.stderr)
+
+    print_summary(records, time.perf_counter() - start)
+    return 0 if all(r["status"] == "success" for r in records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
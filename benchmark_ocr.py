@@ -0,0 +1,90 @@
+"""
+OCR backend benchmark - Paddle vs ONNX Runtime on sample invoices.
+
+    python -m benchmark_ocr uploads/*.pdf --threads 4 [--int8] [--max-pages 10]
+
+Pages are rasterized once and fed to both backends. Reports pages/sec per
+backend and, using Paddle as the reference, per-page text similarity and
+whether the extracted VINs / engine numbers / invoice numbers match.
+"""
+import argparse
+import difflib
+import sys
+import time
+
+from batch_extract import find_pdfs
+
+
+def page_text(lines):
+    return "\n".join(l["text"] for l in sorted(lines, key=lambda l: (round(l["y"] / 10), l["x"])))
+
+
+def run_backend(service, images):
+    """OCR every (pdf, page, image); returns ({(pdf, page): lines}, seconds)"""
+    service.get_ocr()  # model load is not part of the measurement
+    start = time.perf_counter()
+    results = {(pdf, n): service.ocr_page(img) for pdf, n, img in images}
+    return results, time.perf_counter() - start
+
+
+def extraction_summary(service, pdf, page_lines):
+    pages = [service._make_page(n, lines) for (p, n), lines in sorted(page_lines.items()) if p == pdf]
+    return [
+        (inv["invoice_no"], sorted((v["chassis_number"], v.get("engine_number")) for v in inv["vehicles"]))
+        for inv in service.extract_invoices(pages)
+    ]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m benchmark_ocr", description=__doc__.split("\n")[1])
+    ap.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    ap.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads (0 = all cores)")
+    ap.add_argument("--int8", action="store_true", help="Use det_int8.onnx / rec_int8.onnx")
+    ap.add_argument("--model-dir", default=None)
+    ap.add_argument("--max-pages", type=int, default=0, help="Limit pages per PDF (0 = all)")
+    ap.add_argument("--poppler-path", default=None)
+    args = ap.parse_args(argv)
+
+    from ocr_service import OCRService
+    from onnx_ocr import OnnxOCR
+
+    paddle = OCRService(poppler_path=args.poppler_path, backend="paddle")
+    onnx = OCRService(poppler_path=args.poppler_path, backend="onnx")
+    onnx._ocr = OnnxOCR(model_dir=args.model_dir, threads=args.threads, int8=args.int8)
+
+    images = []
+    for pdf in find_pdfs(args.inputs):
+        count = len(paddle.pdf_page_sizes(pdf))
+        pages = range(1, (min(count, args.max_pages) if args.max_pages else count) + 1)
+        images += [(pdf, n, paddle._to_bgr(img)) for n, img in paddle.iter_page_images(pdf, pages)]
+    if not images:
+        print("No pages found", file=sys.stderr)
+        return 1
+
+    ref, t_paddle = run_backend(paddle, images)
+    out, t_onnx = run_backend(onnx, images)
+
+    n = len(images)
+    print(f"Pages: {n}")
+    print(f"paddle: {n / t_paddle:6.2f} pages/s ({1000 * t_paddle / n:.0f} ms/page)")
+    label = "onnx-int8" if args.int8 else "onnx"
+    print(f"{label}: {n / t_onnx:6.2f} pages/s ({1000 * t_onnx / n:.0f} ms/page), "
+          f"speedup x{t_paddle / t_onnx:.2f}")
+
+    sims = [difflib.SequenceMatcher(None, page_text(ref[k]), page_text(out[k])).ratio() for k in ref]
+    print(f"Text similarity vs paddle: mean {sum(sims) / n:.3f}, min {min(sims):.3f}")
+
+    pdfs = sorted({pdf for pdf, _, _ in images})
+    same = 0
+    for pdf in pdfs:
+        expected = extraction_summary(paddle, pdf, ref)
+        got = extraction_summary(onnx, pdf, out)
+        same += expected == got
+        if expected != got:
+            print(f"  extraction differs: {pdf}\n    paddle: {expected}\n    {label}: {got}")
+    print(f"Extraction (invoice no + VIN + engine) identical: {same}/{len(pdfs)} PDFs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Checkpoint Store - per-page OCR checkpoints so large PDFs can resume
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+
+MAGIC = b"OCK1"
+# magic, page index, meta length, payload length
+HEADER = struct.Struct("<4sIII")
+
+# Concurrent requests for the same PDF share a job directory (same content hash);
+# manifest read-modify-write is serialized per job within the process
+_manifest_locks = {}
+_manifest_locks_guard = threading.Lock()
+
+
+def _manifest_lock(path):
+    with _manifest_locks_guard:
+        return _manifest_locks.setdefault(path, threading.Lock())
+
+
+def job_id_for_file(path, chunk_size=1 << 20):
+    """Content hash of the PDF: a retried upload of the same file maps to the same job"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()[:32]
+
+
+def encode_page(page_index, page_type, lines, extra=None):
+    """
+    Columnar page record: x and y as float32 columns, text as one UTF-8 blob
+    plus a uint32 length column, the whole payload zlib-compressed.
+    """
+    texts = [l["text"].encode("utf-8") for l in lines]
+    xs = array("f", (float(l["x"]) for l in lines))
+    ys = array("f", (float(l["y"]) for l in lines))
+    lengths = array("I", (len(t) for t in texts))
+    payload = zlib.compress(
+        struct.pack("<I", len(lines)) + xs.tobytes() + ys.tobytes() + lengths.tobytes() + b"".join(texts),
+        6
+    )
+    meta = dict(extra or {}, type=page_type)
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(MAGIC, page_index, len(meta_bytes), len(payload)) + meta_bytes + payload
+
+
+def decode_page(data, with_lines=True):
+    magic, page_index, meta_len, payload_len = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an OCR checkpoint record")
+    offset = HEADER.size
+    meta = json.loads(data[offset:offset + meta_len].decode("utf-8"))
+    page = dict(meta, index=page_index)
+    if not with_lines:
+        return page
+
+    raw = zlib.decompress(data[offset + meta_len:offset + meta_len + payload_len])
+    (n,) = struct.unpack_from("<I", raw)
+    pos = 4
+    xs = array("f")
+    xs.frombytes(raw[pos:pos + 4 * n])
+    pos += 4 * n
+    ys = array("f")
+    ys.frombytes(raw[pos:pos + 4 * n])
+    pos += 4 * n
+    lengths = array("I")
+    lengths.frombytes(raw[pos:pos + lengths.itemsize * n])
+    pos += lengths.itemsize * n
+
+    lines = []
+    for x, y, length in zip(xs, ys, lengths):
+        lines.append({"text": raw[pos:pos + length].decode("utf-8"), "x": x, "y": y})
+        pos += length
+    page["lines"] = lines
+    return page
+
+
+class JobCheckpoint:
+    """Checkpoint directory of one PDF job: manifest.json + one record per completed page"""
+
+    def __init__(self, root, job_id):
+        self.job_id = job_id
+        self.path = os.path.join(root, job_id)
+        os.makedirs(self.path, exist_ok=True)
+
+    def _page_path(self, page_index):
+        return os.path.join(self.path, f"page_{page_index:04d}.ckpt")
+
+    def _write_atomic(self, path, data):
+        # Unique temp file per write: threads and processes may write the same job at once
+        # The directory may have been discarded by a finished request for the same PDF
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    # ----------------------------------------------------
+    # Manifest
+    # ----------------------------------------------------
+    def read_manifest(self):
+        try:
+            with open(os.path.join(self.path, "manifest.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"job_id": self.job_id, "status": "unknown"}
+
+    def update_manifest(self, **fields):
+        with _manifest_lock(self.path):
+            manifest = self.read_manifest()
+            manifest.update(fields, job_id=self.job_id, updated_at=time.time())
+            self._write_atomic(os.path.join(self.path, "manifest.json"),
+                               json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+        return manifest
+
+    # ----------------------------------------------------
+    # Pages
+    # ----------------------------------------------------
+    def completed_pages(self):
+        return sorted(
+            int(name[5:9]) for name in os.listdir(self.path)
+            if name.startswith("page_") and name.endswith(".ckpt")
+        )
+
+    def has_page(self, page_index):
+        return os.path.exists(self._page_path(page_index))
+
+    def save_page(self, page_index, page_type, lines, extra=None):
+        self._write_atomic(self._page_path(page_index), encode_page(page_index, page_type, lines, extra))
+
+    def load_page(self, page_index, with_lines=True):
+        with open(self._page_path(page_index), "rb") as f:
+            return decode_page(f.read(), with_lines=with_lines)
+
+    def status(self, with_lines=False):
+        """Progress snapshot, readable while the job is still running"""
+        manifest = self.read_manifest()
+        done = self.completed_pages()
+        manifest["pages_completed"] = len(done)
+        manifest["pages"] = [self.load_page(i, with_lines=with_lines) for i in done]
+        return manifest
+
+
+class CheckpointStore:
+    """
+    Checkpoints exist to resume interrupted jobs, not as a result cache:
+    callers discard a job once it succeeded, and jobs untouched for
+    ``retention_hours`` (failed or abandoned) are pruned.
+    """
+
+    PRUNE_INTERVAL = 600
+
+    def __init__(self, root="checkpoints", retention_hours=None):
+        self.root = root
+        self.retention_hours = retention_hours if retention_hours is not None \
+            else float(os.getenv("CHECKPOINT_RETENTION_HOURS", "24"))
+        self._last_prune = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def open_job(self, job_id):
+        if time.time() - self._last_prune > self.PRUNE_INTERVAL:
+            self.prune()
+        return JobCheckpoint(self.root, job_id)
+
+    def prune(self, now=None):
+        """Remove jobs not written to for more than retention_hours"""
+        now = now or time.time()
+        self._last_prune = now
+        cutoff = now - self.retention_hours * 3600
+        removed = []
+        for job_id in os.listdir(self.root):
+            job = os.path.join(self.root, job_id)
+            if not os.path.isdir(job):
+                continue
+            # Every page / manifest write renames into the directory and bumps its mtime
+            if os.path.getmtime(job) < cutoff:
+                self.discard(job_id)
+                removed.append(job_id)
+        return removed
+
+    def exists(self, job_id):
+        return os.path.isdir(os.path.join(self.root, job_id))
+
+    def discard(self, job_id):
+        shutil.rmtree(os.path.join(self.root, job_id), ignore_errors=True)
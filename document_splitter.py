@@ -0,0 +1,113 @@
+"""
+Document Splitter - find invoice boundaries inside a multi-invoice PDF
+"""
+import re
+from parsers.text_index import OCR_CONFUSION_FOLD, TextIndex, fold_accents
+
+# Title of the invoice, searched only near the top of a page (on folded text)
+HEADER_PATTERN = re.compile(r'HOA\s*DON|\bINVOICE\b')
+HEADER_REGION = 0.3
+
+
+def has_invoice_header(page_lines):
+    """True if an invoice title appears in the top part of the page"""
+    if not page_lines:
+        return False
+    index = TextIndex.of(page_lines)
+    top = min(l["y"] for l in index)
+    bottom = max(l["y"] for l in index)
+    limit = top + (bottom - top) * HEADER_REGION
+    return any(
+        l["y"] <= limit and HEADER_PATTERN.search(folded)
+        for l, folded in zip(index, index.line_folded)
+    )
+
+
+def invoice_key(invoice_no):
+    """Invoice number compared across pages: OCR look-alikes folded (O000554 == 0000554)"""
+    return fold_accents(invoice_no).translate(OCR_CONFUSION_FOLD) if invoice_no else None
+
+
+def split_documents(pages, registry, default_parser=None):
+    """
+    Group OCR'd pages into one segment per invoice.
+
+    A new segment starts at an INVOICE page carrying an invoice header whose
+    invoice number differs from the current segment's (an unreadable number
+    is treated as a continuation; numbers are compared by invoice_key so an
+    OCR misread does not split an invoice). INVOICE pages without a header
+    continue the current invoice. Supporting pages (certificates, customs
+    sheets): if the PDF starts with one, the bundle puts supporting pages
+    before their invoice, so they are attached to the next invoice;
+    otherwise they are attached to the previous one.
+
+    ``pages`` items need "index", "type", "lines" and "text". The invoice
+    number of a header page is read by the parser detected on that page,
+    falling back to ``default_parser`` (usually the whole-document layout).
+    Returns a list of {"pages": [...], "invoice_no": str | None}.
+    """
+    splitter = DocumentSplitter(registry, default_parser)
+    for page in pages:
+        splitter.add(page)
+    splitter.flush()
+    for seg in splitter.segments:
+        seg["pages"].sort(key=lambda p: p["index"])
+    return splitter.segments
+
+
+class DocumentSplitter:
+    """
+    split_documents one page at a time, for streaming: feed pages in index
+    order to add(); ``current`` is the segment the returned pages joined.
+    """
+
+    def __init__(self, registry, default_parser=None):
+        self.registry = registry
+        self.default_parser = default_parser
+        self.segments = []
+        self.current = None
+        self.pending = []  # supporting pages waiting for the next invoice
+        self.leading_support = None
+
+    def add(self, page):
+        """Place a page; returns the pages that joined ``current`` now ([] while the page waits)"""
+        header = _is_header_page(page)
+        if self.leading_support is None:
+            self.leading_support = not header
+        if not header:
+            if self.current is None or (self.leading_support and page["type"] != "INVOICE"):
+                self.pending.append(page)
+                return []
+            self.current["pages"].append(page)
+            return [page]
+
+        index = TextIndex.of(page["lines"])
+        parser, _ = self.registry.detect(index.folded, folded=True)
+        parser = parser or self.default_parser
+        invoice_no = parser.extract_invoice_number(index) if parser else None
+
+        current = self.current
+        joined = self.pending + [page]
+        if current is not None and (invoice_no is None or current["invoice_no"] is None
+                                    or invoice_key(invoice_no) == invoice_key(current["invoice_no"])):
+            current["pages"].extend(joined)
+            current["invoice_no"] = current["invoice_no"] or invoice_no
+        else:
+            self.current = {"pages": joined, "invoice_no": invoice_no}
+            self.segments.append(self.current)
+        self.pending = []
+        return joined
+
+    def flush(self):
+        """End of document: attach waiting pages to the last segment; returns them"""
+        joined, self.pending = self.pending, []
+        if joined:
+            if self.current is None:
+                self.current = {"pages": [], "invoice_no": None}
+                self.segments.append(self.current)
+            self.current["pages"].extend(joined)
+        return joined
+
+
+def _is_header_page(page):
+    return page["type"] == "INVOICE" and has_invoice_header(page["lines"])
@@ -1,6 +1,10 @@
 import ollama
 import json
+import logging
 import re
+from tracing import lazy, save_artifact
+
+logger = logging.getLogger(__name__)
 
 # Dictionary sửa lỗi OCR phổ biến (chữ mờ/sai) → chữ đúng tiếng Việt
 OCR_FIX_DICT = [
@@ -98,6 +102,8 @@ def _parse_description_fallback(hint):
     desc = (desc_match.group(0).strip() if desc_match else text[:250].strip()).strip()
     
     # 2. Extract Color: Look for "Màu" or specific keywords
+    # Accent-sensitive on purpose: folded text would merge Màu (color) with Mẫu (form),
+    # and chỗ (seats) with chở / chọn, so this fallback does not use parsers.text_index
     color = None
     color_match = re.search(r"(?:Mau|Màu)\s+([A-Za-zÀ-ỹ ]+)", text, re.I)
     if color_match:
@@ -176,6 +182,8 @@ CRITICAL: number_of_seats MUST be 1-2 digits ONLY. vehicle_description MUST be m
 
 OUTPUT JSON ONLY:"""
 
+        save_artifact("llm_prompt.txt", lambda: f"{system_prompt}\n\n{user_prompt}")
+
         try:
             response = ollama.chat(
                 model=self.model_name,
@@ -188,23 +196,24 @@ OUTPUT JSON ONLY:"""
             )
             
             content = response['message']['content'].strip()
-            print(f"DEBUG [LLM]: Raw response length: {len(content)} chars")
-            print(f"DEBUG [LLM]: Response preview: {content[:300]}...")
-            
+            save_artifact("llm_response.json", lambda: content)
+            logger.debug("LLM raw response: %d chars, preview: %s", len(content), lazy(lambda: content[:300]))
+
             result = json.loads(content)
-            print(f"DEBUG [LLM]: Parsed JSON - invoice: {result.get('invoice_number')}, vehicles: {len(result.get('vehicle_list', []))}")
+            logger.debug("LLM parsed JSON - invoice: %s, vehicles: %d",
+                         result.get("invoice_number"), len(result.get("vehicle_list", [])))
             
             if not result.get("invoice_number"):
                 result["invoice_number"] = fallback_invoice
             
             validated = self.validate_and_restore(result, extracted_data)
-            print(f"DEBUG [LLM]: After validation - vehicles: {len(validated.get('vehicle_list', []))}")
+            logger.debug("LLM after validation - vehicles: %d", len(validated.get("vehicle_list", [])))
             return validated
             
         except Exception as e:
-            print(f"ERROR [LLM]: {e}")
-            import traceback
-            traceback.print_exc()
+            # Full traceback only when debugging; the fallback below is the normal path
+            logger.warning("LLM refine failed, using OCR fallback: %s", e,
+                           exc_info=logger.isEnabledFor(logging.DEBUG))
             inv = fallback_invoice if fallback_invoice else invoice_no_from_ocr
             # Luôn trả format chuẩn (vehicle_description, color, seats), không trả description_hint
             vehicle_list = self._normalize_vehicle_list(extracted_data)
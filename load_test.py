@@ -0,0 +1,308 @@
+"""
+Load test harness - drive /extract concurrently against a fake Ollama.
+
+    python -m load_test uploads/ -c 8 -n 64 --llm-latency 2.0 --llm-tps 40 --llm-error-rate 0.05
+    python -m load_test uploads/ --mode subprocess --workers 2 -c 16 -n 200 --json report.json
+
+The app runs in-process (uvicorn in a background thread) or as a separate
+uvicorn process; either way it talks to a local fake Ollama HTTP server with
+configurable latency, token throughput and error rate. An async client
+uploads PDFs from the corpus with N concurrent requests and reports
+p50/p95/p99 latency, throughput, error rate and the server's peak RSS.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_extract import find_pdfs
+
+
+# ----------------------------------------------------
+# Fake Ollama
+# ----------------------------------------------------
+class FakeOllama:
+    """Minimal /api/chat server: sleeps latency + tokens / tokens_per_sec, fails at error_rate"""
+
+    def __init__(self, latency=1.0, tokens_per_sec=50.0, error_rate=0.0, port=0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._send(200, {"models": [{"name": "fake"}]})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                fake.requests += 1
+                if random.random() < fake.error_rate:
+                    fake.errors += 1
+                    time.sleep(fake.latency)
+                    self._send(500, {"error": "fake ollama error"})
+                    return
+                content = fake.answer(body)
+                # ~4 characters per token
+                time.sleep(fake.latency + len(content) / 4 / max(fake.tokens_per_sec, 1e-6))
+                self._send(200, {
+                    "model": body.get("model", "fake"),
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "message": {"role": "assistant", "content": content},
+                    "done": True,
+                })
+
+            def _send(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @staticmethod
+    def answer(body):
+        """Echo the VERIFIED LIST of the prompt back as a well-formed refinement"""
+        prompt = next((m["content"] for m in body.get("messages", []) if m.get("role") == "user"), "")
+        m = re.search(r"VERIFIED LIST \(Target vehicles\):\n(.*?)\n\nREFERENCE", prompt, re.S)
+        try:
+            verified = json.loads(m.group(1)) if m else []
+        except json.JSONDecodeError:
+            verified = []
+        return json.dumps({
+            "invoice_number": verified[0].get("invoice_no_from_header") if verified else None,
+            "vehicle_list": [{
+                "chassis_number": v.get("chassis_number"),
+                "engine_number": v.get("engine_number"),
+                "vehicle_description": (v.get("description_hint") or "")[:120],
+                "color": v.get("color"),
+                "number_of_seats": "5",
+                "quantity": "1",
+            } for v in verified],
+        }, ensure_ascii=False)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+# ----------------------------------------------------
+# App under test
+# ----------------------------------------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url, timeout=120):
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{url}/docs", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"App at {url} did not start")
+
+
+def start_inprocess(port):
+    """Import main (after OLLAMA_HOST is set) and serve it from a thread"""
+    import uvicorn
+    import main
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    return server, os.getpid()
+
+
+def start_subprocess(port, workers):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=dict(os.environ),
+    )
+    return proc, proc.pid
+
+
+def _rss_kb(pid):
+    """Current RSS of pid and its children (uvicorn workers), from /proc"""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    total = 0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total += next(int(l.split()[1]) for l in f if l.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+class RssSampler:
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, _rss_kb(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.pid == os.getpid():
+            # ru_maxrss is in KB on Linux
+            self.peak_kb = max(self.peak_kb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+# ----------------------------------------------------
+# Client
+# ----------------------------------------------------
+def unique_copy(data):
+    """PDF bytes + a trailing comment, so checkpoints (keyed by content hash) are not reused"""
+    return data + f"\n% load-test {uuid.uuid4().hex}\n".encode()
+
+
+async def drive(url, corpus, concurrency, total, timeout, reuse_checkpoints):
+    import httpx
+
+    blobs = [(os.path.basename(p), open(p, "rb").read()) for p in corpus]
+    results = []
+    counter = iter(range(total))
+
+    async def worker(client):
+        for i in counter:
+            name, data = blobs[i % len(blobs)]
+            payload = data if reuse_checkpoints else unique_copy(data)
+            start = time.perf_counter()
+            try:
+                resp = await client.post(f"{url}/extract", files={"file": (name, payload, "application/pdf")})
+                ok = resp.status_code == 200 and resp.json().get("status") == "success"
+            except (httpx.HTTPError, ValueError):
+                ok = False
+            results.append((time.perf_counter() - start, ok))
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def report(results, wall, peak_kb, fake):
+    latencies = [lat for lat, _ in results]
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "requests": len(results),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(results) / wall, 3) if wall else 0.0,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "latency_s": {f"p{q}": round(percentile(latencies, q), 3) for q in (50, 95, 99)},
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "fake_ollama": {"requests": fake.requests, "errors": fake.errors},
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m load_test", description="Load test for /extract")
+    ap.add_argument("corpus", nargs="+", help="Sample PDFs, directories or glob patterns")
+    ap.add_argument("-c", "--concurrency", type=int, default=4)
+    ap.add_argument("-n", "--requests", type=int, default=20)
+    ap.add_argument("--mode", choices=("inprocess", "subprocess"), default="inprocess")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers (subprocess mode)")
+    ap.add_argument("--url", help="Test an already running app instead (no RSS measurement)")
+    ap.add_argument("--llm-latency", type=float, default=1.0, help="Fake Ollama base latency (s)")
+    ap.add_argument("--llm-tps", type=float, default=50.0, help="Fake Ollama tokens/second")
+    ap.add_argument("--llm-error-rate", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=600.0)
+    ap.add_argument("--reuse-checkpoints", action="store_true",
+                    help="Upload identical bytes (repeat files resume from OCR checkpoints)")
+    ap.add_argument("--json", help="Also write the report to this file")
+    args = ap.parse_args(argv)
+
+    corpus = find_pdfs(args.corpus)
+    if not corpus:
+        print("No PDFs in corpus", file=sys.stderr)
+        return 1
+
+    fake = FakeOllama(args.llm_latency, args.llm_tps, args.llm_error_rate).start()
+    os.environ["OLLAMA_HOST"] = fake.url
+    proc = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), None
+    else:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        if args.mode == "inprocess":
+            _, pid = start_inprocess(port)
+        else:
+            proc, pid = start_subprocess(port, args.workers)
+        _wait_ready(url)
+
+    try:
+        if pid:
+            with RssSampler(pid) as rss:
+                results, wall = asyncio.run(drive(url, corpus, args.concurrency, args.requests,
+                                                  args.timeout, args.reuse_checkpoints))
+            peak_kb = rss.peak_kb
+        else:
+            results, wall = asyncio.run(drive(url, corpus, args.concurrency, args.requests,
+                                              args.timeout, args.reuse_checkpoints))
+            peak_kb = 0
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+        fake.stop()
+
+    summary = report(results, wall, peak_kb, fake)
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
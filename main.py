@@ -1,16 +1,26 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
 import shutil
 import os
 import uuid
 from ocr_service import OCRService
 from llm_service import LLMService
+from checkpoint_store import CheckpointStore, job_id_for_file
+from tracing import configure_logging, in_context, lazy, start_trace
+from sse_stream import StreamClosed, stream_events
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Invoice Extraction Engine")
 
 # Cấu hình Poppler
 POPPLER_PATH = os.getenv("POPPLER_PATH")
 if not POPPLER_PATH and os.name == 'nt':
-    # Thử đường dẫn mặc định trên máy bạn (đã thấy trong test_extraction.py)
+    # Thử đường dẫn mặc định trên máy Windows
     default_path = r"C:\poppler\poppler-24.08.0\Library\bin"
     if os.path.exists(default_path):
         POPPLER_PATH = default_path
@@ -19,49 +29,170 @@ if not POPPLER_PATH and os.name == 'nt':
 ocr_service = OCRService(poppler_path=POPPLER_PATH)
 llm_service = LLMService(model_name=os.getenv("OLLAMA_MODEL", "llama3:8b"))
 
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "4"))
+
+# Checkpoint từng trang OCR để job bị gián đoạn có thể chạy tiếp
+checkpoint_store = CheckpointStore(os.getenv("CHECKPOINT_DIR", "checkpoints"))
+
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+def refine_invoice(inv):
+    json_data = llm_service.refine_extraction(
+        inv["full_text"], inv["vehicles"], inv["layout"], invoice_no_from_ocr=inv["invoice_no"]
+    )
+    if not json_data.get("invoice_number") and inv["invoice_no"]:
+        json_data["invoice_number"] = inv["invoice_no"]
+    return {
+        "layout_detected": inv["layout"],
+        "pages": inv["pages"],
+        "data": json_data
+    }
+
+
+def refine_invoices(invoices):
+    if len(invoices) <= 1:
+        return [refine_invoice(inv) for inv in invoices]
+    with ThreadPoolExecutor(max_workers=min(len(invoices), LLM_WORKERS)) as pool:
+        return list(pool.map(in_context(refine_invoice), invoices))
+
+
 @app.post("/extract")
 async def extract_invoice(file: UploadFile = File(...)):
+    """
+    job_id = 32 ký tự hex đầu của SHA-256 nội dung file, client tự tính được để
+    theo dõi GET /jobs/{job_id} khi job đang chạy (hoặc dùng /extract/stream:
+    event "start" trả job_id ngay). Checkpoint bị xóa khi job thành công.
+    """
     # 1. Lưu file tạm
     file_id = str(uuid.uuid4())
+    # Trace id đi theo request qua mọi bước (OCR, parser, LLM) và vào log
+    trace_id = start_trace(file_id.replace("-", "")[:16])
     file_extension = os.path.splitext(file.filename)[1]
     temp_path = os.path.join(UPLOAD_DIR, f"{file_id}{file_extension}")
     
     with open(temp_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
+    job = checkpoint_store.open_job(job_id_for_file(temp_path))
+    job.update_manifest(filename=file.filename)
+
     try:
-        # 1. Chạy OCR + Layout Detection + Specialized Extraction
-        extracted_data, layout_type, full_raw_text, invoice_no = ocr_service.extract_text_from_pdf(temp_path)
-        
-        print(f"Layout Detected: {layout_type}")
-        print(f"Items found: {len(extracted_data)}")
-        print(f"Invoice No (OCR): {invoice_no}")
-        if extracted_data:
-            print(f"DEBUG: First vehicle description_hint: {extracted_data[0].get('description_hint', '')[:200]}")
-
-        # 2. Dùng AI làm sạch và ánh xạ JSON (Refine)
-        json_data = llm_service.refine_extraction(
-            full_raw_text, extracted_data, layout_type, invoice_no_from_ocr=invoice_no
-        )
-        if not json_data.get("invoice_number") and invoice_no:
-            json_data["invoice_number"] = invoice_no
-        
+        # 1. Chạy OCR + Tách hóa đơn + Layout Detection + Specialized Extraction
+        stats = {}
+        invoices = await run_in_threadpool(ocr_service.extract_invoices_from_pdf, temp_path, job, stats)
+
+        for inv in invoices:
+            logger.info("Invoice %s (pages %s): layout=%s, items=%d",
+                        inv["invoice_no"], inv["pages"], inv["layout"], len(inv["vehicles"]))
+            if inv["vehicles"]:
+                logger.debug("First vehicle description_hint: %s",
+                             lazy(lambda: inv["vehicles"][0].get("description_hint", "")[:200]))
+
+        # 2. Dùng AI làm sạch và ánh xạ JSON (Refine) - song song theo từng hóa đơn
+        results = await run_in_threadpool(refine_invoices, invoices)
+
+        # Checkpoint chỉ để chạy tiếp job bị gián đoạn, không làm cache kết quả
+        checkpoint_store.discard(job.job_id)
+
+        first = results[0] if results else {"layout_detected": "UNKNOWN", "data": {"invoice_number": None, "vehicle_list": []}}
         return {
             "status": "success",
-            "layout_detected": layout_type,
+            "trace_id": trace_id,
+            "job_id": job.job_id,
             "filename": file.filename,
-            "data": json_data
+            "invoice_count": len(results),
+            "invoices": results,
+            "admission": stats.get("admission"),
+            "page_rotations": stats.get("rotations", []),
+            "page_templates": stats.get("templates", []),
+            # Giữ tương thích với client cũ: hóa đơn đầu tiên
+            "layout_detected": first["layout_detected"],
+            "data": first["data"]
         }
     except Exception as e:
-        return {"status": "error", "message": str(e)}
+        logger.exception("Extraction failed for %s", file.filename)
+        job.update_manifest(status="error", error=str(e))
+        return {"status": "error", "trace_id": trace_id, "job_id": job.job_id, "message": str(e)}
     finally:
         # Dọn dẹp file tạm
         if os.path.exists(temp_path):
             os.remove(temp_path)
 
+@app.post("/extract/stream")
+async def extract_invoice_stream(file: UploadFile = File(...)):
+    """
+    Như /extract nhưng trả kết quả dần dần (Server-Sent Events):
+    page -> layout -> invoice_number -> vehicle (từng xe khi parse xong trang)
+    -> invoice (kết quả parser) -> invoice_refined (bản LLM thay thế bản thô) -> done
+    """
+    file_id = str(uuid.uuid4())
+    trace_id = start_trace(file_id.replace("-", "")[:16])
+    file_extension = os.path.splitext(file.filename)[1]
+    temp_path = os.path.join(UPLOAD_DIR, f"{file_id}{file_extension}")
+
+    with open(temp_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    job = checkpoint_store.open_job(job_id_for_file(temp_path))
+    job.update_manifest(filename=file.filename)
+
+    def produce(emit):
+        try:
+            emit("start", {"trace_id": trace_id, "job_id": job.job_id, "filename": file.filename})
+            stats = {}
+            invoices = []
+            for event, data in ocr_service.iter_extraction_events(temp_path, job, stats):
+                if event == "invoice":
+                    invoices.append(data)
+                    # full_text chỉ dùng cho LLM, không gửi xuống client
+                    data = {k: v for k, v in data.items() if k != "full_text"}
+                emit(event, data)
+
+            # LLM refine song song, hóa đơn nào xong trước gửi trước
+            if invoices:
+                with ThreadPoolExecutor(max_workers=min(len(invoices), LLM_WORKERS)) as pool:
+                    futures = {pool.submit(in_context(refine_invoice), inv): inv["index"] for inv in invoices}
+                    for future in as_completed(futures):
+                        emit("invoice_refined", dict(future.result(), index=futures[future]))
+
+            emit("done", {"invoice_count": len(invoices), "admission": stats.get("admission"),
+                          "page_rotations": stats.get("rotations", []),
+                          "page_templates": stats.get("templates", [])})
+            checkpoint_store.discard(job.job_id)
+        except StreamClosed:
+            logger.info("Client disconnected from stream for %s", file.filename)
+            # Giữ các trang đã OCR để gửi lại file thì chạy tiếp, nhưng không để "running" mãi
+            job.update_manifest(status="cancelled")
+            raise
+        except Exception as e:
+            logger.exception("Extraction failed for %s", file.filename)
+            job.update_manifest(status="error", error=str(e))
+            raise
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    return StreamingResponse(stream_events(in_context(produce)), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/admission")
+def get_admission():
+    """Ngân sách bộ nhớ OCR: đang dùng, đỉnh, số job đang chạy / đang chờ"""
+    return ocr_service.admission.stats()
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, lines: bool = False):
+    """
+    Tiến độ + kết quả OCR từng trang, đọc được khi job đang chạy, đã lỗi hoặc
+    client đã ngắt stream (status "cancelled"); job thành công thì checkpoint
+    đã bị xóa -> 404.
+    job_id = sha256(nội dung PDF).hexdigest()[:32]
+    """
+    if not job_id.isalnum() or not checkpoint_store.exists(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return checkpoint_store.open_job(job_id).status(with_lines=lines)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
@@ -1,33 +1,70 @@
 import os
+import logging
 import cv2
 import numpy as np
 import re
-from pdf2image import convert_from_path
-from parsers import HyundaiParser, VinFastParser
+import threading
+import time
+import uuid
+from pdf2image import convert_from_path, pdfinfo_from_path
+from parsers import default_registry
+from parsers.text_index import FoldedText, TextIndex
+from document_splitter import DocumentSplitter, split_documents
+from admission import MemoryBudget
+from orientation import detect_orientation, rotate
+from template_registry import TemplateRegistry, ocr_with_template
+from tracing import current_trace_id, is_sampled, save_artifact
+from checkpoint_store import decode_page, job_id_for_file
+from work_queue import SqliteWorkQueue
+
+logger = logging.getLogger(__name__)
 
 os.environ["FLAGS_use_mkldnn"] = "0"
 os.environ["FLAGS_pir_executor"] = "0"
 
+# Parsers' pixel thresholds are tuned for 300 DPI; lower-DPI OCR is scaled back to it
+BASE_DPI = 300
+
 
 class OCRService:
-    def __init__(self, poppler_path=None):
+    def __init__(self, poppler_path=None, admission=None, backend=None, work_queue=None):
         self._ocr = None
+        # "paddle" (default) or "onnx" (onnxruntime CPU, see onnx_ocr.py)
+        self.backend = (backend or os.getenv("OCR_BACKEND", "paddle")).lower()
+        # PaddleOCR predictors are not thread-safe; requests run in a threadpool
+        self._ocr_lock = threading.Lock()
         self.poppler_path = poppler_path
+        # Global memory budget shared by every extraction running in this process
+        self.admission = admission or MemoryBudget.from_env()
+        # Page-level rotation fix instead of the per-line angle classifier
+        self.orientation_check = os.getenv("ORIENTATION_CHECK", "1") != "0"
+        # Known fixed-layout pages (certificates) are OCR'd only in their field regions
+        self.templates = TemplateRegistry()
+        # WORK_QUEUE_PATH set: pages are OCR'd by worker processes on this host (python -m ocr_worker)
+        if work_queue is None and os.getenv("WORK_QUEUE_PATH"):
+            work_queue = SqliteWorkQueue()
+        self.work_queue = work_queue
+        self.queue_timeout = float(os.getenv("WORK_QUEUE_TIMEOUT", "1800"))
 
-        self.parsers = [
-            HyundaiParser(),
-            VinFastParser()
-        ]
+        # Parsers are discovered through the registry and instantiated on first match
+        self.registry = default_registry()
 
     def get_ocr(self):
         if self._ocr is None:
-            print("INITIALIZING PADDLEOCR (LAZY LOAD)...")
-            from paddleocr import PaddleOCR
-            self._ocr = PaddleOCR(
-                use_angle_cls=False,  # Tắt để chạy nhanh hơn trên Render
-                lang='vi',
-                show_log=False
-            )
+            with self._ocr_lock:
+                if self._ocr is None:
+                    if self.backend == "onnx":
+                        logger.info("Initializing ONNX Runtime OCR (lazy load)")
+                        from onnx_ocr import OnnxOCR
+                        self._ocr = OnnxOCR()
+                    else:
+                        logger.info("Initializing PaddleOCR (lazy load)")
+                        from paddleocr import PaddleOCR
+                        self._ocr = PaddleOCR(
+                            use_angle_cls=False,  # Tắt để chạy nhanh hơn trên Render
+                            lang='vi',
+                            show_log=False
+                        )
         return self._ocr
 
     # ----------------------------------------------------
@@ -37,18 +74,56 @@ class OCRService:
         return convert_from_path(
             pdf_path,
             poppler_path=self.poppler_path,
-            dpi=300
+            dpi=BASE_DPI
         )
 
+    def pdf_page_sizes(self, pdf_path):
+        """Page sizes in points, read with pdfinfo (no rasterization)"""
+        info = pdfinfo_from_path(pdf_path, poppler_path=self.poppler_path)
+        count = int(info["Pages"])
+        if count > 1:
+            # -f/-l make pdfinfo print one "Page N size" entry per page
+            info.update(pdfinfo_from_path(pdf_path, poppler_path=self.poppler_path, first_page=1, last_page=count))
+        default = self._parse_page_size(info.get("Page size"))
+        sizes = [default] * count
+        for key, value in info.items():
+            m = re.match(r'Page\s+(\d+)\s+size', key)
+            if m and 1 <= int(m.group(1)) <= count:
+                sizes[int(m.group(1)) - 1] = self._parse_page_size(value)
+        return sizes
+
+    @staticmethod
+    def _parse_page_size(value):
+        m = re.match(r'\s*([\d.]+)\s*x\s*([\d.]+)', value or "")
+        # Unknown size: assume A4
+        return (float(m.group(1)), float(m.group(2))) if m else (595.0, 842.0)
+
+    def iter_page_images(self, pdf_path, page_numbers, batch_size=4, dpi=BASE_DPI):
+        """Rasterize only the requested pages (1-based), a few consecutive pages at a time"""
+        batch = []
+        for n in list(page_numbers) + [None]:
+            if batch and (n is None or n != batch[-1] + 1 or len(batch) >= batch_size):
+                images = convert_from_path(
+                    pdf_path,
+                    poppler_path=self.poppler_path,
+                    dpi=dpi,
+                    first_page=batch[0],
+                    last_page=batch[-1]
+                )
+                yield from zip(batch, images)
+                batch = []
+            if n is not None:
+                batch.append(n)
+
     # ----------------------------------------------------
     # OCR with coordinates
     # ----------------------------------------------------
     def ocr_page(self, image):
-        if not isinstance(image, np.ndarray):
-            image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        image = self._to_bgr(image)
 
         ocr_engine = self.get_ocr()
-        result = ocr_engine.ocr(image)
+        with self._ocr_lock:
+            result = ocr_engine.ocr(image)
         lines = []
 
         if result and result[0]:
@@ -61,13 +136,49 @@ class OCRService:
 
         return lines
 
+    def ocr_page_auto(self, image):
+        """OCR via a matching page template if there is one, else full-page OCR.
+        Returns (lines, template name or None)."""
+        image = self._to_bgr(image)
+        template = self.templates.match(image)
+        if template is not None:
+            lines = ocr_with_template(template, image, self.ocr_page)
+            if lines is not None:
+                return lines, template.name
+            logger.info("Template %s matched but a field was empty, falling back to full OCR", template.name)
+        return self.ocr_page(image), None
+
+    @staticmethod
+    def _to_bgr(image):
+        if not isinstance(image, np.ndarray):
+            image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        return image
+
+    # ----------------------------------------------------
+    # Orientation (cheap page-level check, see orientation.py)
+    # ----------------------------------------------------
+    def correct_orientation(self, image):
+        """Return (upright BGR image, clockwise rotation applied, deciding check)"""
+        image = self._to_bgr(image)
+        angle, method = detect_orientation(image, probe=self._probe_confidence)
+        return rotate(image, angle), angle, method
+
+    def _probe_confidence(self, crop):
+        """Recognition-only OCR of one small text-line crop; returns its confidence"""
+        ocr_engine = self.get_ocr()
+        with self._ocr_lock:
+            result = ocr_engine.ocr(crop, det=False, cls=False)
+        scores = [item[1] for item in (result[0] if result and result[0] else [])
+                  if isinstance(item, (list, tuple)) and len(item) == 2]
+        return sum(scores) / len(scores) if scores else 0.0
+
     # ----------------------------------------------------
     # Page classification
     # ----------------------------------------------------
-    def classify_page(self, page_lines):
-        text = " ".join(l["text"] for l in page_lines).upper()
+    def classify_page(self, page_lines, folded_text=None):
+        text = folded_text if folded_text is not None else TextIndex.of(page_lines).folded
 
-        if re.search(r'(HOA\s*DON|HOADON|VAT|INVOICE|INV\s*NO)', text):
+        if re.search(r'HOA\s*DON|VAT|INVOICE|INV\s*NO', text):
             return "INVOICE"
 
         if re.search(r'(PHIEU|CERTIFICATE|KIEM\s*TRA|CHAT\s*LUONG)', text):
@@ -78,75 +189,202 @@ class OCRService:
     # ----------------------------------------------------
     # Layout detection
     # ----------------------------------------------------
-    def detect_layout(self, full_text):
-        for parser in self.parsers:
-            if parser.can_handle(full_text):
-                name = parser.__class__.__name__.replace("Parser", "").upper()
-                return parser, name
-        return None, "UNKNOWN"
+    def detect_layout(self, full_text, folded_text=None):
+        # One automaton pass scores every registered parser at once
+        if folded_text is not None:
+            return self.registry.detect(folded_text, folded=True)
+        return self.registry.detect(full_text)
 
     # ----------------------------------------------------
-    # Main extract function
+    # OCR all pages of a PDF
     # ----------------------------------------------------
-    def extract_text_from_pdf(self, pdf_path):
-        images = self.pdf_to_images(pdf_path)
-        print(f"DEBUG: PDF has {len(images)} pages")
+    def ocr_pdf_pages(self, pdf_path, checkpoint=None, stats=None):
+        pages = sorted(self.iter_ocr_pages(pdf_path, checkpoint=checkpoint, stats=stats), key=lambda p: p["index"])
+        self._finish_pages(pages, stats)
+        return pages
 
-        pages = []
-        full_text = ""
+    def iter_ocr_pages(self, pdf_path, checkpoint=None, stats=None):
+        """
+        OCR + classify every page, yielding each page as soon as it is ready
+        (checkpointed pages first). With a JobCheckpoint, pages already stored
+        are loaded instead of re-OCR'd and each new page is saved as soon as
+        it completes, so a restarted job resumes from the last finished page.
+
+        Rasterization is admitted against the global memory budget; the plan
+        (DPI, resident pages, queue wait) is written to ``stats["admission"]``
+        and per-stage seconds are added to ``stats["timings"]``. With a work
+        queue the pages are OCR'd by worker nodes instead (iter_queued_pages).
+        """
+        timings = stats.setdefault("timings", {}) if stats is not None else {}
+        page_sizes = self.pdf_page_sizes(pdf_path)
+        page_count = len(page_sizes)
+        logger.info("PDF has %d pages", page_count)
+
+        done = set()
+        if checkpoint is not None:
+            done = set(checkpoint.completed_pages())
+            checkpoint.update_manifest(status="running", pages_total=page_count)
+            if done:
+                logger.info("Resuming job %s: %d/%d pages checkpointed", checkpoint.job_id, len(done), page_count)
+
+        for page_idx in sorted(done):
+            stored = checkpoint.load_page(page_idx)
+            yield self._make_page(page_idx, stored["lines"], stored["type"],
+                                  rotation=stored.get("rotation", 0),
+                                  template=stored.get("template"))
+
+        todo = [n for n in range(1, page_count + 1) if n not in done]
+        if self.work_queue is not None and todo:
+            # Per request: concurrent uploads of the same PDF share a checkpoint job, not queue tasks
+            base = checkpoint.job_id if checkpoint is not None else job_id_for_file(pdf_path)
+            job_id = f"{base}-{uuid.uuid4().hex[:8]}"
+            yield from self.iter_queued_pages(pdf_path, todo, job_id, checkpoint=checkpoint, stats=stats)
+            if checkpoint is not None:
+                checkpoint.update_manifest(status="ocr_done")
+            return
+
+        plan = self.admission.plan([page_sizes[n - 1] for n in todo])
+        queue_wait = self.admission.acquire(plan)
+        if plan.downgraded:
+            logger.warning("Large document downgraded to %d DPI, %d resident page(s)", plan.dpi, plan.resident_pages)
+        if stats is not None:
+            stats["admission"] = dict(plan.report(), queue_wait_ms=round(queue_wait * 1000, 1),
+                                      budget=self.admission.stats())
+
+        try:
+            t_prev = time.perf_counter()
+            for page_idx, img in self.iter_page_images(pdf_path, todo, batch_size=plan.resident_pages, dpi=plan.dpi):
+                _add_timing(timings, "rasterize", time.perf_counter() - t_prev)
+                page = self.ocr_image(page_idx, img, dpi=plan.dpi, timings=timings)
+                del img
+                if checkpoint is not None:
+                    checkpoint.save_page(page_idx, page["type"], page["lines"],
+                                         extra={"rotation": page["rotation"], "template": page["template"]})
+                yield page
+                t_prev = time.perf_counter()
+        finally:
+            self.admission.release(plan)
+
+        if checkpoint is not None:
+            checkpoint.update_manifest(status="ocr_done")
 
-        # OCR + classify
-        for idx, img in enumerate(images):
-            page_idx = idx + 1
-            lines = self.ocr_page(img)
-            page_type = self.classify_page(lines)
+    def ocr_image(self, page_idx, img, dpi=BASE_DPI, timings=None):
+        """Orientation fix + OCR + classify one rasterized page (lines in 300 DPI coordinates)"""
+        timings = timings if timings is not None else {}
+        t_ocr = time.perf_counter()
+        rotation = 0
+        if self.orientation_check:
+            img, rotation, method = self.correct_orientation(img)
+            t_orient = time.perf_counter()
+            _add_timing(timings, "orientation", t_orient - t_ocr)
+            t_ocr = t_orient
+            if rotation:
+                logger.info("Page %d rotated %d degrees (%s check)", page_idx, rotation, method)
+        lines, template = self.ocr_page_auto(img)
+        _add_timing(timings, "ocr", time.perf_counter() - t_ocr)
+        scale = BASE_DPI / dpi
+        if scale != 1:
+            lines = [dict(l, x=l["x"] * scale, y=l["y"] * scale) for l in lines]
+        page = self._make_page(page_idx, lines, rotation=rotation, template=template)
+        logger.debug("Page %d -> %s (%d lines)", page_idx, page["type"], len(lines))
+        return page
 
-            pages.append({
-                "index": page_idx,
-                "type": page_type,
-                "lines": lines
-            })
+    def iter_queued_pages(self, pdf_path, todo, job_id, checkpoint=None, stats=None):
+        """
+        Shard pages over OCR worker nodes through the work queue and yield
+        them as workers finish. ``pdf_path`` must be on storage the workers
+        share (UPLOAD_DIR on a common volume).
+        """
+        if stats is not None:
+            stats["admission"] = {"mode": "queue", "pages": len(todo)}
+        payload = {"pdf_path": os.path.abspath(pdf_path), "trace_id": current_trace_id(), "sampled": is_sampled()}
+        self.work_queue.submit(job_id, [(n, payload) for n in todo])
+        try:
+            for page_idx, result in self.work_queue.iter_results(job_id, todo, timeout=self.queue_timeout):
+                stored = decode_page(result)
+                page = self._make_page(page_idx, stored["lines"], stored["type"],
+                                       rotation=stored.get("rotation", 0), template=stored.get("template"))
+                if checkpoint is not None:
+                    checkpoint.save_page(page_idx, page["type"], page["lines"],
+                                         extra={"rotation": page["rotation"], "template": page["template"]})
+                yield page
+        finally:
+            # Results live on in the checkpoint; the queue job id is unique to this request
+            self.work_queue.purge(job_id)
 
-            full_text += "\n".join(l["text"] for l in lines) + "\n"
-            print(f"DEBUG: Page {page_idx} -> {page_type}")
+    def _finish_pages(self, pages, stats):
+        """Per-page report + sampled debug artifact once every page is OCR'd"""
+        if stats is not None:
+            stats["rotations"] = [{"page": p["index"], "rotation": p["rotation"]} for p in pages]
+            stats["templates"] = [{"page": p["index"], "template": p["template"]} for p in pages if p["template"]]
+        save_artifact("ocr_lines.json", lambda: [{"index": p["index"], "type": p["type"], "lines": p["lines"]} for p in pages])
+
+    def _make_page(self, page_idx, lines, page_type=None, rotation=0, template=None):
+        # Folded shadow text built once here; parsers and classifiers reuse it
+        lines = TextIndex.of(lines)
+        if page_type is None:
+            page_type = self.classify_page(lines, folded_text=lines.folded)
+        return {
+            "index": page_idx,
+            "type": page_type,
+            "rotation": rotation,
+            "template": template,
+            "lines": lines,
+            "text": lines.text,
+            "folded": lines.folded
+        }
+
+    # ----------------------------------------------------
+    # Extract one invoice from its pages
+    # ----------------------------------------------------
+    def extract_segment(self, pages, invoice_no=None):
+        full_text = "".join(p["text"] + "\n" for p in pages)
+        page_numbers = [p["index"] for p in pages]
+        # Pages' folded text joined, not folded again
+        segment_text = FoldedText.join([p["text"] for p in pages], [p["folded"] for p in pages])
 
         # Detect layout
-        parser, layout = self.detect_layout(full_text)
+        parser, layout = self.detect_layout(full_text, folded_text=segment_text.folded)
         if not parser:
-            print("ERROR: No parser matched")
-            return [], "UNKNOWN", full_text, None
+            logger.error("No parser matched (pages %s)", page_numbers)
+            return {"vehicles": [], "layout": "UNKNOWN", "full_text": full_text,
+                    "invoice_no": invoice_no, "pages": page_numbers}
 
-        print(f"Layout detected: {layout}")
+        logger.info("Layout detected: %s (pages %s)", layout, page_numbers)
 
         # Invoice number
-        invoice_no = parser.extract_invoice_number(full_text)
-        print(f"Invoice No: {invoice_no}")
+        invoice_no = invoice_no or parser.extract_invoice_number(segment_text)
+        logger.info("Invoice No: %s", invoice_no)
 
         # Filter pages for extraction
         relevant_pages = []
         for p in pages:
-            if layout == "HYUNDAI":
-                if p["type"] in ("INVOICE", "CERTIFICATE"):
-                    relevant_pages.append(p["lines"])
-            elif layout == "VINFAST":
-                if p["type"] == "INVOICE":
-                    relevant_pages.append(p["lines"])
+            if p["type"] in parser.RELEVANT_PAGE_TYPES:
+                relevant_pages.append(p["lines"])
 
-        print(f"DEBUG: Relevant pages = {len(relevant_pages)}")
+        logger.debug("Relevant pages = %d", len(relevant_pages))
 
         # Extract vehicles
         vehicles = parser.extract_vehicles(relevant_pages, full_text)
-        print(f"DEBUG: Vehicles extracted = {len(vehicles)}")
+        logger.debug("Vehicles extracted = %d", len(vehicles))
 
         # Golden Principle #5: Assert unique VINs match total count
         if vehicles:
             unique_vins = {v["chassis_number"] for v in vehicles}
             if len(unique_vins) != len(vehicles):
-                print(f"WARNING: VIN count mismatch! Unique: {len(unique_vins)}, Total: {len(vehicles)}")
+                logger.warning("VIN count mismatch! Unique: %d, Total: %d", len(unique_vins), len(vehicles))
                 # Optionally deduplicate here or raise error depending on prod requirements
                 # For now, we follow the rule that VIN = 1 vehicle anchor.
         color = parser.extract_color(relevant_pages)
 
+        final = self._normalize_vehicles(vehicles, color, invoice_no)
+
+        logger.info("Final vehicles = %d", len(final))
+        return {"vehicles": final, "layout": layout, "full_text": full_text,
+                "invoice_no": invoice_no, "pages": page_numbers}
+
+    @staticmethod
+    def _normalize_vehicles(vehicles, color, invoice_no):
         # Final normalize
         final = []
         for v in vehicles:
@@ -159,6 +397,106 @@ class OCRService:
                 v["color"] = v.get("color") or color
                 v["invoice_no_from_header"] = invoice_no
                 final.append(v)
+        return final
+
+    # ----------------------------------------------------
+    # Main extract function (whole PDF = one invoice)
+    # ----------------------------------------------------
+    def extract_text_from_pdf(self, pdf_path):
+        pages = self.ocr_pdf_pages(pdf_path)
+        result = self.extract_segment(pages)
+        return result["vehicles"], result["layout"], result["full_text"], result["invoice_no"]
+
+    # ----------------------------------------------------
+    # Multi-invoice extract: one result per invoice in the PDF
+    # ----------------------------------------------------
+    def extract_invoices_from_pdf(self, pdf_path, checkpoint=None, stats=None):
+        pages = self.ocr_pdf_pages(pdf_path, checkpoint=checkpoint, stats=stats)
+        t0 = time.perf_counter()
+        invoices = self.extract_invoices(pages)
+        if stats is not None:
+            stats["pages"] = pages
+            _add_timing(stats.setdefault("timings", {}), "parse", time.perf_counter() - t0)
+        return invoices
+
+    def extract_invoices(self, pages):
+        doc_parser, _ = self.detect_layout(None, folded_text="\n".join(p["folded"] for p in pages))
+        segments = split_documents(pages, self.registry, default_parser=doc_parser)
+        logger.info("Invoices in document = %d", len(segments))
+        # Sequential: parsing is pure-Python regex work, threads would only contend
+        # for the GIL. Invoices are refined by the LLM concurrently (see main.py).
+        return [self.extract_segment(seg["pages"], seg["invoice_no"]) for seg in segments]
+
+    # ----------------------------------------------------
+    # Progressive extraction (streaming)
+    # ----------------------------------------------------
+    def iter_extraction_events(self, pdf_path, checkpoint=None, stats=None):
+        """
+        Yield (event, data) as work completes: "page" per OCR'd page,
+        "layout" as soon as it can be read from the pages seen so far,
+        "invoice_number" once per invoice of the PDF (boundaries as in
+        split_documents), "vehicle" for each new VIN as its page is parsed,
+        stamped with its own invoice's number, then one authoritative
+        "invoice" per invoice segment (same result as extract_invoices;
+        these dicts still carry full_text for the LLM).
+        """
+        pages = []
+        parser, splitter = None, None
+        # Invoice boundaries need pages in index order; checkpointed and
+        # queued pages can arrive out of order, so later ones wait here
+        ready, next_index = {}, 1
+        stream = {"segment": None, "invoice_no": None, "vins": set()}
+        # Keyword hits of the pages so far: each page is scanned once, not re-joined
+        layout_hits = set()
+
+        for page in self.iter_ocr_pages(pdf_path, checkpoint=checkpoint, stats=stats):
+            pages.append(page)
+            yield "page", {"page": page["index"], "type": page["type"], "rotation": page["rotation"],
+                           "template": page["template"], "lines": len(page["lines"])}
+            ready[page["index"]] = page
+
+            if parser is None:
+                layout_hits |= self.registry.keyword_hits(page["folded"], folded=True)
+                parser, layout = self.registry.detect_hits(layout_hits)
+                if parser is None:
+                    continue
+                yield "layout", {"layout": layout}
+                splitter = DocumentSplitter(self.registry, default_parser=parser)
+
+            while next_index in ready:
+                joined = splitter.add(ready.pop(next_index))
+                next_index += 1
+                yield from self._segment_events(parser, splitter.current, joined, stream)
+
+        if splitter is not None:
+            for index in sorted(ready):
+                yield from self._segment_events(parser, splitter.current, splitter.add(ready[index]), stream)
+            yield from self._segment_events(parser, splitter.current, splitter.flush(), stream)
+
+        pages.sort(key=lambda p: p["index"])
+        self._finish_pages(pages, stats)
+        for idx, inv in enumerate(self.extract_invoices(pages)):
+            yield "invoice", dict(inv, index=idx)
+
+    def _segment_events(self, parser, segment, joined, stream):
+        """"invoice_number" and "vehicle" events for pages that just joined ``segment``"""
+        for p in joined:
+            if stream["segment"] is not segment:
+                # Next invoice of the PDF: its own number from here on
+                stream["segment"], stream["invoice_no"] = segment, None
+            if stream["invoice_no"] is None:
+                invoice_no = segment["invoice_no"] or parser.extract_invoice_number(p["lines"])
+                if invoice_no:
+                    stream["invoice_no"] = invoice_no
+                    yield "invoice_number", {"invoice_no": invoice_no, "page": p["index"]}
+            if p["type"] not in parser.RELEVANT_PAGE_TYPES:
+                continue
+            found = parser.extract_vehicles([p["lines"]], p["text"])
+            for v in self._normalize_vehicles(found, None, stream["invoice_no"]):
+                if v["chassis_number"] not in stream["vins"]:
+                    stream["vins"].add(v["chassis_number"])
+                    yield "vehicle", dict(v, page=p["index"])
+
 
-        print(f"FINAL vehicles = {len(final)}")
-        return final, layout, full_text, invoice_no
+def _add_timing(timings, stage, seconds):
+    timings[stage] = timings.get(stage, 0.0) + seconds
@@ -0,0 +1,58 @@
+"""
+OCR worker node - pulls page tasks from the shared work queue.
+
+    WORK_QUEUE_PATH=/shared/queue/work.db python -m ocr_worker [--idle-exit 300]
+
+Workers are stateless: each task names a PDF on shared storage and a page
+number; the worker rasterizes that page, OCRs it and stores the encoded
+page (checkpoint record format) as the task result. Run as many as the
+host allows (processes or containers on the same machine: the SQLite
+queue is single-host, see work_queue); a worker that dies mid-page loses
+its lease and the page is delivered to another worker.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+
+from checkpoint_store import encode_page
+from tracing import configure_logging, start_trace
+from work_queue import LEASE_SECONDS, SqliteWorkQueue, default_worker_id, serve
+
+
+def make_handler(service):
+    def handle(task):
+        # Continue the API request's trace: worker logs and artifacts carry its id
+        start_trace(task.payload.get("trace_id"), sample_percent=100 if task.payload.get("sampled") else 0)
+        _, img = next(service.iter_page_images(task.payload["pdf_path"], [task.page], batch_size=1))
+        page = service.ocr_image(task.page, img)
+        return encode_page(task.page, page["type"], page["lines"],
+                           extra={"rotation": page["rotation"], "template": page["template"]})
+    return handle
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m ocr_worker", description="OCR worker node")
+    ap.add_argument("--queue", default=None, help="SQLite queue file (default: WORK_QUEUE_PATH)")
+    ap.add_argument("--lease", type=float, default=LEASE_SECONDS, help="Lease seconds per task")
+    ap.add_argument("--idle-exit", type=float, default=None, help="Exit after N idle seconds")
+    ap.add_argument("--poppler-path", default=os.getenv("POPPLER_PATH"))
+    args = ap.parse_args(argv)
+
+    configure_logging()
+    from ocr_service import OCRService
+    service = OCRService(poppler_path=args.poppler_path)
+    service.get_ocr()  # load the model before taking the first lease
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    worker_id = default_worker_id()
+    done = serve(SqliteWorkQueue(args.queue), make_handler(service), worker_id=worker_id,
+                 lease_seconds=args.lease, stop=stop, idle_exit=args.idle_exit)
+    print(f"{worker_id}: {done} page(s) completed", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
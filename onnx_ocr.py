@@ -0,0 +1,193 @@
+"""
+ONNX Runtime OCR backend - PP-OCR detection + recognition on CPU
+
+Drop-in for the PaddleOCR object used by OCRService: ``ocr(image)`` returns
+the same ``[[ [box, (text, score)], ... ]]`` structure, so ``ocr_page`` is
+unchanged. Enable with OCR_BACKEND=onnx.
+
+Models are the PP-OCR inference models exported with paddle2onnx:
+
+    paddle2onnx --model_dir vi_PP-OCR_det --model_filename inference.pdmodel \
+        --params_filename inference.pdiparams --save_file models/onnx/det.onnx
+    (same for rec.onnx; dict.txt is the recognizer's character dictionary)
+
+Optional int8 models (det_int8.onnx / rec_int8.onnx, used when ONNX_INT8=1):
+
+    python -m onnx_ocr quantize models/onnx
+"""
+import math
+import os
+import sys
+
+import cv2
+import numpy as np
+
+DET_LIMIT_SIDE = 960
+DET_THRESH = 0.3
+DET_BOX_THRESH = 0.6
+DET_UNCLIP_RATIO = 1.5
+DET_MIN_SIZE = 3
+REC_HEIGHT = 48
+# Minimum batch width; like PaddleOCR's resize_norm_img the batch widens to the widest crop
+REC_BASE_WIDTH = 320
+REC_BATCH = 6
+DROP_SCORE = 0.5
+
+
+def _model_path(model_dir, name, int8):
+    path = os.path.join(model_dir, f"{name}.onnx")
+    int8_path = os.path.join(model_dir, f"{name}_int8.onnx")
+    return int8_path if int8 and os.path.exists(int8_path) else path
+
+
+class OnnxOCR:
+    def __init__(self, model_dir=None, threads=None, int8=None):
+        import onnxruntime as ort
+
+        model_dir = model_dir or os.getenv("ONNX_MODEL_DIR", "models/onnx")
+        threads = threads if threads is not None else int(os.getenv("ONNX_THREADS", "0"))
+        int8 = int8 if int8 is not None else os.getenv("ONNX_INT8", "0") == "1"
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = threads  # 0 = onnxruntime default (all cores)
+        opts.inter_op_num_threads = 1
+        providers = ["CPUExecutionProvider"]
+
+        self.det = ort.InferenceSession(_model_path(model_dir, "det", int8), opts, providers=providers)
+        self.rec = ort.InferenceSession(_model_path(model_dir, "rec", int8), opts, providers=providers)
+        with open(os.path.join(model_dir, "dict.txt"), encoding="utf-8") as f:
+            # CTC blank first, trailing space as in PaddleOCR use_space_char=True
+            self.charset = ["blank"] + [line.rstrip("\r\n") for line in f] + [" "]
+
+    # ----------------------------------------------------
+    # PaddleOCR-compatible entry point
+    # ----------------------------------------------------
+    def ocr(self, image, det=True, cls=False):
+        if not det:
+            return [self.recognize([image])]
+        boxes = self.detect(image)
+        crops = [_crop_box(image, box) for box in boxes]
+        results = self.recognize(crops)
+        lines = [
+            [box.tolist(), (text, score)]
+            for box, (text, score) in zip(boxes, results)
+            if score >= DROP_SCORE
+        ]
+        return [lines]
+
+    # ----------------------------------------------------
+    # Detection (DB)
+    # ----------------------------------------------------
+    def detect(self, image):
+        h, w = image.shape[:2]
+        scale = min(1.0, DET_LIMIT_SIDE / max(h, w))
+        rh = max(32, int(round(h * scale / 32)) * 32)
+        rw = max(32, int(round(w * scale / 32)) * 32)
+        resized = cv2.resize(image, (rw, rh)).astype(np.float32) / 255.0
+        resized = (resized - (0.485, 0.456, 0.406)) / (0.229, 0.224, 0.225)
+        blob = resized.transpose(2, 0, 1)[None].astype(np.float32)
+
+        prob = self.det.run(None, {self.det.get_inputs()[0].name: blob})[0][0, 0]
+        bitmap = (prob > DET_THRESH).astype(np.uint8)
+        contours, _ = cv2.findContours(bitmap, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        boxes = []
+        for contour in contours:
+            rect = cv2.minAreaRect(contour)
+            if min(rect[1]) < DET_MIN_SIZE:
+                continue
+            if _box_score(prob, cv2.boxPoints(rect)) < DET_BOX_THRESH:
+                continue
+            (cx, cy), (bw, bh), angle = rect
+            # DB unclip: grow the shrunk text kernel by area * ratio / perimeter
+            d = bw * bh * DET_UNCLIP_RATIO / (2 * (bw + bh))
+            box = cv2.boxPoints(((cx, cy), (bw + 2 * d, bh + 2 * d), angle))
+            box[:, 0] = np.clip(box[:, 0] * w / rw, 0, w - 1)
+            box[:, 1] = np.clip(box[:, 1] * h / rh, 0, h - 1)
+            boxes.append(_order_points(box))
+
+        boxes.sort(key=lambda b: (round(b[0][1] / 10), b[0][0]))
+        return boxes
+
+    # ----------------------------------------------------
+    # Recognition (CTC)
+    # ----------------------------------------------------
+    def recognize(self, crops):
+        results = [("", 0.0)] * len(crops)
+        order = sorted(range(len(crops)), key=lambda i: crops[i].shape[1] / max(1, crops[i].shape[0]))
+        for start in range(0, len(order), REC_BATCH):
+            idx = order[start:start + REC_BATCH]
+            widths = rec_widths([crops[i] for i in idx])
+            batch = np.zeros((len(idx), 3, REC_HEIGHT, rec_batch_width(widths)), np.float32)
+            for row, (i, width) in enumerate(zip(idx, widths)):
+                img = cv2.resize(crops[i], (width, REC_HEIGHT)).astype(np.float32) / 255.0
+                batch[row, :, :, :width] = ((img - 0.5) / 0.5).transpose(2, 0, 1)
+            probs = self.rec.run(None, {self.rec.get_inputs()[0].name: batch})[0]
+            for row, i in enumerate(idx):
+                results[i] = self._ctc_decode(probs[row])
+        return results
+
+    def _ctc_decode(self, probs):
+        best = probs.argmax(axis=1)
+        conf = probs.max(axis=1)
+        keep = best != 0
+        keep[1:] &= best[1:] != best[:-1]
+        chars = [self.charset[c] for c in best[keep] if c < len(self.charset)]
+        return "".join(chars), float(conf[keep].mean()) if keep.any() else 0.0
+
+
+def rec_widths(crops):
+    """Width of each crop resized to REC_HEIGHT, aspect ratio kept (no cap)"""
+    return [max(1, math.ceil(REC_HEIGHT * c.shape[1] / max(1, c.shape[0]))) for c in crops]
+
+
+def rec_batch_width(widths):
+    """PaddleOCR: imgW = int(48 * max_wh_ratio), never below the base 320 px"""
+    return max([REC_BASE_WIDTH] + widths)
+
+
+def _order_points(box):
+    """Top-left, top-right, bottom-right, bottom-left (PaddleOCR box order)"""
+    s = box.sum(axis=1)
+    d = np.diff(box, axis=1).ravel()
+    return np.array([box[s.argmin()], box[d.argmin()], box[s.argmax()], box[d.argmax()]], np.float32)
+
+
+def _box_score(prob, box):
+    h, w = prob.shape
+    x0, x1 = int(np.clip(box[:, 0].min(), 0, w - 1)), int(np.clip(box[:, 0].max(), 0, w - 1))
+    y0, y1 = int(np.clip(box[:, 1].min(), 0, h - 1)), int(np.clip(box[:, 1].max(), 0, h - 1))
+    mask = np.zeros((y1 - y0 + 1, x1 - x0 + 1), np.uint8)
+    cv2.fillPoly(mask, [(box - (x0, y0)).astype(np.int32)], 1)
+    return cv2.mean(prob[y0:y1 + 1, x0:x1 + 1], mask)[0]
+
+
+def _crop_box(image, box):
+    """Perspective-crop a text box; tall crops are rotated to horizontal"""
+    w = int(max(np.linalg.norm(box[0] - box[1]), np.linalg.norm(box[2] - box[3])))
+    h = int(max(np.linalg.norm(box[0] - box[3]), np.linalg.norm(box[1] - box[2])))
+    dst = np.array([[0, 0], [w, 0], [w, h], [0, h]], np.float32)
+    crop = cv2.warpPerspective(image, cv2.getPerspectiveTransform(box, dst), (max(1, w), max(1, h)),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    if crop.shape[0] >= crop.shape[1] * 1.5:
+        crop = np.ascontiguousarray(np.rot90(crop))
+    return crop
+
+
+def quantize_models(model_dir):
+    """Write det_int8.onnx / rec_int8.onnx next to the float models (dynamic int8)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    for name in ("det", "rec"):
+        src = os.path.join(model_dir, f"{name}.onnx")
+        dst = os.path.join(model_dir, f"{name}_int8.onnx")
+        quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+        print(f"{src} -> {dst}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "quantize":
+        quantize_models(sys.argv[2])
+    else:
+        print("usage: python -m onnx_ocr quantize <model_dir>")
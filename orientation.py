@@ -0,0 +1,174 @@
+"""
+Page Orientation - cheap upright / sideways / upside-down check before OCR
+
+PaddleOCR runs with use_angle_cls=False for speed, so rotated scans must be
+fixed at page level. The check works on a ~800px binarized thumbnail:
+
+1. Projection profiles: text lines make the row profile (upright / 180)
+   or the column profile (90 / 270) strongly periodic. Long table rules
+   are removed first; if neither profile clearly dominates, the probe OCR
+   (see 3) reads one line at 0 and at 90 degrees.
+2. Line-shape asymmetry: inside a text line, ascenders and Vietnamese
+   diacritics put more ink above the x-height band than descenders put
+   below it, so the sign tells upright from flipped. It is only trusted
+   over MIN_TEXT_LINES lines; without a probe an untrusted page keeps its
+   base orientation.
+3. With a probe, a tiny OCR of one text-line crop confirms any rotation:
+   the line is read upright and in the candidate orientations, and the
+   most confident wins (ties keep the page as is). Only an upright page
+   with a trusted asymmetry skips the probe.
+"""
+import cv2
+import numpy as np
+
+THUMB_SIZE = 800
+# Column/row profile score ratio above which a page is treated as sideways
+SIDEWAYS_RATIO = 1.5
+# |asymmetry| below this is ambiguous and falls back to the probe OCR
+MIN_ASYMMETRY = 0.08
+# Fewer text lines than this: the asymmetry is not trusted at all
+MIN_TEXT_LINES = 4
+
+ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+def rotate(image, angle):
+    """Rotate clockwise by 0/90/180/270 degrees"""
+    return image if angle == 0 else cv2.rotate(image, ROTATE_CODES[angle])
+
+
+def _binarize_thumb(image):
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    scale = THUMB_SIZE / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return binary
+
+
+def _strip_rules(binary):
+    """
+    Remove long horizontal / vertical strokes (table rules, borders): an
+    invoice's ruled item table otherwise makes both profiles periodic.
+    """
+    h, w = binary.shape
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, w // 8), 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(15, h // 8))))
+    return binary & ~(horizontal | vertical)
+
+
+def _ink_box(binary):
+    """Crop to the ink bounding box so page margins do not skew the profiles"""
+    ys, xs = np.nonzero(binary)
+    if not len(ys):
+        return binary
+    return binary[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+
+
+def _profile_score(profile):
+    """
+    Coefficient of variation of a smoothed projection profile: across text
+    lines it alternates between full lines and empty gaps, along them it is
+    nearly flat.
+    """
+    profile = np.convolve(profile.astype(np.float64), np.ones(3) / 3, mode="same")
+    mean = profile.mean()
+    return float(profile.std() / mean) if mean else 0.0
+
+
+def _text_lines(binary, min_height=4):
+    """Row ranges of text lines in an upright (or 180) binary thumbnail"""
+    rows = binary.sum(axis=1)
+    ink = rows > max(1, 0.02 * binary.shape[1])
+    lines, start = [], None
+    for i, on in enumerate(ink):
+        if on and start is None:
+            start = i
+        elif not on and start is not None:
+            if i - start >= min_height:
+                lines.append((start, i))
+            start = None
+    return lines
+
+
+def line_asymmetry(binary):
+    """
+    (ink above x-height band - ink below) / line ink, averaged over lines.
+    Positive for upright text, negative for upside-down text.
+    """
+    total, weighted = 0.0, 0.0
+    for top, bottom in _text_lines(binary):
+        rows = binary[top:bottom].sum(axis=1).astype(np.float64)
+        band = np.where(rows >= 0.5 * rows.max())[0]
+        above = rows[:band[0]].sum()
+        below = rows[band[-1] + 1:].sum()
+        mass = rows.sum()
+        weighted += above - below
+        total += mass
+    return weighted / total if total else 0.0
+
+
+def densest_line_crop(image, binary):
+    """Crop (from the full-resolution image) of the text line with the most ink"""
+    lines = _text_lines(binary)
+    if not lines:
+        return None
+    top, bottom = max(lines, key=lambda l: binary[l[0]:l[1]].sum())
+    cols = np.where(binary[top:bottom].sum(axis=0) > 0)[0]
+    scale = image.shape[0] / binary.shape[0]
+    pad = int((bottom - top) * scale * 0.3)
+    y0, y1 = max(0, int(top * scale) - pad), min(image.shape[0], int(bottom * scale) + pad)
+    x0, x1 = int(cols[0] * scale), int((cols[-1] + 1) * scale)
+    # Keep the probe tiny: at most ~1/3 of the page width
+    x1 = min(x1, x0 + image.shape[1] // 3)
+    return image[y0:y1, x0:x1]
+
+
+def _probe_line(image, binary, angle, probe):
+    """Probe confidence of the densest text line with the page rotated by ``angle``"""
+    crop = densest_line_crop(rotate(image, angle), rotate(binary, angle))
+    return probe(crop) if crop is not None and crop.size else 0.0
+
+
+def detect_orientation(image, probe=None):
+    """
+    Return (angle, method): the clockwise rotation that makes the page
+    upright, and which check decided it ("profile" or "probe").
+    ``probe(crop) -> confidence`` is an optional recognition-only OCR call;
+    when given, it must confirm any rotation before it is applied.
+    """
+    page_binary = _strip_rules(_binarize_thumb(image))
+    ink = _ink_box(page_binary)
+    row_score = _profile_score(ink.sum(axis=1))
+    col_score = _profile_score(ink.sum(axis=0))
+
+    probed = {}
+
+    def confidence(angle):
+        if angle not in probed:
+            probed[angle] = _probe_line(image, page_binary, angle, probe)
+        return probed[angle]
+
+    sideways = col_score > row_score * SIDEWAYS_RATIO
+    if probe is not None and max(row_score, col_score) < min(row_score, col_score) * SIDEWAYS_RATIO:
+        # Neither profile dominates (ruled tables, sparse forms): read a line both ways
+        sideways = confidence(90) > confidence(0)
+    # Bring text lines horizontal first; candidates are then base / flipped
+    base, flipped = (90, 270) if sideways else (0, 180)
+    binary = rotate(page_binary, base)
+
+    # Sparse, stamped or boxed pages (a few labels around VIN rubbings) give
+    # a large asymmetry of either sign: only trust it over enough lines
+    asym = line_asymmetry(binary)
+    trusted = len(_text_lines(binary)) >= MIN_TEXT_LINES and abs(asym) >= MIN_ASYMMETRY
+    angle = (base if asym >= 0 else flipped) if trusted else base
+    if probe is None or (angle == 0 and trusted):
+        return angle, "profile"
+
+    # Upright first: a rotation is only applied if it reads better than the page as is
+    candidates = sorted({0, base, flipped}, key=lambda a: (a != 0, a != angle))
+    return max(candidates, key=confidence), "probe"
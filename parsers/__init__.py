@@ -4,5 +4,9 @@ Parser package initialization
 from .base_parser import InvoiceParser
 from .hyundai_parser import HyundaiParser
 from .vinfast_parser import VinFastParser
+from .registry import ParserRegistry, ParserSpec, default_registry
+from .text_index import FoldedText, TextIndex
 
-__all__ = ['InvoiceParser', 'HyundaiParser', 'VinFastParser']
+__all__ = ['InvoiceParser', 'HyundaiParser', 'VinFastParser',
+           'ParserRegistry', 'ParserSpec', 'default_registry',
+           'FoldedText', 'TextIndex']
@@ -2,14 +2,22 @@
 Base Parser Interface
 """
 from abc import ABC, abstractmethod
+from .layout_matcher import fold_text
 
 class InvoiceParser(ABC):
     """Abstract base class for invoice parsers"""
-    
-    @abstractmethod
+
+    # Layout detection metadata (read by ParserRegistry without instantiating)
+    LAYOUT_NAME = None
+    LAYOUT_KEYWORDS = ()
+    LAYOUT_MIN_HITS = 1
+    # Page types (from OCRService.classify_page) passed to extract_vehicles
+    RELEVANT_PAGE_TYPES = ("INVOICE",)
+
     def can_handle(self, ocr_text: str) -> bool:
         """Check if this parser can handle the given invoice"""
-        pass
+        text = fold_text(ocr_text)
+        return sum(1 for k in self.LAYOUT_KEYWORDS if fold_text(k) in text) >= self.LAYOUT_MIN_HITS
     
     @abstractmethod
     def extract_vehicles(self, pages_data: list, full_text: str) -> list:
@@ -17,8 +25,8 @@ class InvoiceParser(ABC):
         pass
     
     @abstractmethod
-    def extract_invoice_number(self, text: str) -> str:
-        """Extract invoice number"""
+    def extract_invoice_number(self, text) -> str:
+        """Extract invoice number from a str, or a FoldedText / TextIndex folded once per page"""
         pass
     
     @abstractmethod
@@ -1,19 +1,28 @@
 """
 Hyundai Invoice Parser - Ultimate Precision Row Extraction
 """
+import logging
 import re
 from .base_parser import InvoiceParser
+from .text_index import FoldedText, TextIndex
+
+logger = logging.getLogger(__name__)
 
 class HyundaiParser(InvoiceParser):
+    LAYOUT_NAME = "HYUNDAI"
+    LAYOUT_KEYWORDS = ("HYUNDAI", "THANH CONG", "Số khung", "Số máy", "Vin No")
+    LAYOUT_MIN_HITS = 2
+    RELEVANT_PAGE_TYPES = ("INVOICE", "CERTIFICATE")
+
     def __init__(self):
-        print("[HYUNDAI PARSER v3.6 - Final Shield Loaded]")
+        logger.debug("Hyundai parser v3.6 - Final Shield loaded")
         # VIN Regex: Must end with digits (serial number) to avoid swallowing noise at the end
         self.VIN_PATTERN = re.compile(r'(MF3|KM|KN|MAL|RLL|RLU)[A-Z0-9]{5,11}[0-9]{4,6}')
         
-        # Column detection
-        self.SK_PATTERN = r'S[ÔỐOÓÖ06B]?\s*KHUNG|VIN\s*NO|CHASSIS\s*N[O09\)]'
-        self.SM_PATTERN = r'S[ÔỐOÓÖ06B]?\s*M[ÂÁA]Y|ENGINE\s*NO|ENGINE\s*N[O09\)]'
-        self.STT_PATTERN = r'STT|No\.?'
+        # Column detection (on folded text: accents already stripped)
+        self.SK_PATTERN = r'S[O06B]?KHUNG|VINNO|CHASSISN[O09\)]'
+        self.SM_PATTERN = r'S[O06B]?MAY|ENGINEN[O09\)]'
+        self.STT_PATTERN = r'STT|NO\.?'
         
         self.ENGINE_BLACKLIST = ["HOADON", "GIATRI", "VAT", "INVOICE", "THANHTIEN", "SOLUONG", "DONGIA"]
         self.VIN_BLACKLIST = ["PRODUCTION", "OVERALL", "DIMENSIONS", "TECHNICAL", "SPECIFICATION", "COUNTRY"]
@@ -24,8 +33,7 @@ class HyundaiParser(InvoiceParser):
         if not vin or len(vin) < 10 or len(vin) > 20:
             return False
 
-        # 2. Correct common OCR errors before validation
-        vin = vin.replace('O', '0').replace('I', '1').replace('Q', '0')
+        # 2. OCR errors (O/I/Q) are already folded out of the matched text (TextIndex.line_codes)
 
         # 3. Must start with valid prefixes
         if not vin.startswith(("MF3", "KM", "KN", "MAL", "RLL", "RLU")):
@@ -37,20 +45,19 @@ class HyundaiParser(InvoiceParser):
 
         return True
 
-    def _clean_engine(self, raw_text: str) -> str | None:
-        """Strict Engine No validation - Golden Principle #3 (Strict)"""
-        if not raw_text:
+    def _clean_engine(self, text: str) -> str | None:
+        """Strict Engine No validation - Golden Principle #3 (Strict).
+        ``text`` is a folded line without spaces (TextIndex.line_compact)."""
+        if not text:
             return None
 
-        text = raw_text.upper().replace(" ", "")
-
         # Blacklist model names and industrial metadata/labels
         BLACKLIST = [
             "STARGAZER", "HYUNDAI", "XEOTO", "CONCHO", "NGUOI",
             "CONCH", "SEAT", "CHO", "CRETA", "TUCSON", "SANTAFE", "VENUE",
             "CHASSIS", "ENGINE", "PRODUCTION", "OVERALL", "DIMENSIONS",
             "TOKHAI", "HANGHOA", "NHAPKHAU", "CUSTOMS", "DECLARATION",
-            "S6TOKHAI", "SỐTK", "TRUNG", "LOAI", "TYPE", "VARIANT", "MODEL", "IOAI"
+            "S6TOKHAI", "SOTK", "TRUNG", "LOAI", "TYPE", "VARIANT", "MODEL", "IOAI"
         ]
         if any(b in text for b in BLACKLIST):
             return None
@@ -68,38 +75,35 @@ class HyundaiParser(InvoiceParser):
 
         return None
 
-    def can_handle(self, ocr_text: str) -> bool:
-        keywords = ["HYUNDAI", "THANH CONG", "Số khung", "Số máy", "Vin No"]
-        return sum(1 for k in keywords if k.upper() in ocr_text.upper()) >= 2
-
     def extract_invoice_number(self, text: str) -> str:
         """Extract invoice number from header only - Golden Principle #1 (Robust)"""
-        if not text: return None
+        text = FoldedText.of(text)
+        if not text.text: return None
         patterns = [
             # Handle variations of S[ốoö6] (Inv No) : 000123
-            r'S.?\s*\((?:Inv|Invoice)\s*No\.?\)\s*[:\-]?\s*([A-Z0-9]{5,20})',
+            r'S.?\s*\((?:INV|INVOICE)\s*NO\.?\)\s*[:\-]?\s*([A-Z0-9]{5,20})',
             r'INV\s*NO\.?\s*[:\-]?\s*([A-Z0-9]{5,20})',
             # Multi-line match for Hóa đơn ... Số
-            r'H[ÓO]A\s*[ĐD]ƠN[^\n]*\n.*?S.?\s*[:\-]?\s*([0-9]{5,20})',
-            r'H[ÓO]A\s*[ĐD]ƠN.*?S.?\s*[:\-]?\s*([0-9]{5,20})'
+            r'HOA\s*DON[^\n]*\n.*?S.?\s*[:\-]?\s*([0-9]{5,20})',
+            r'HOA\s*DON.*?S.?\s*[:\-]?\s*([0-9]{5,20})'
         ]
         for pat in patterns:
-            m = re.search(pat, text, re.I | re.S | re.UNICODE)
-            if m: return m.group(1).strip()
+            m = text.search(pat, re.S)
+            if m: return text.source(m, 1).strip()
         return None
 
     def extract_color(self, pages_data: list) -> str:
         if not pages_data: return None
         # Scan all pages for color
-        full_text = " ".join([l["text"] for page in pages_data for l in page])
+        full_text = TextIndex.join_lines(pages_data)
         color_patterns = [
-            r'M[aà]u\s*s[aắ]c\s*[:\-]?\s*([A-ZÀ-Ỹ\s]{2,20})',
-            r'M[aà]u\s*s[oơ]n\s*[:\-]?\s*([A-ZÀ-Ỹ\s]{2,20})'
+            r'MAU\s*SAC\s*[:\-]?\s*([A-Z\s]{2,20})',
+            r'MAU\s*SON\s*[:\-]?\s*([A-Z\s]{2,20})'
         ]
         for pat in color_patterns:
-            match = re.search(pat, full_text, re.I | re.UNICODE)
+            match = full_text.search(pat)
             if match:
-                color = match.group(1).strip()
+                color = full_text.source(match, 1).strip()
                 color = re.split(r'[,.\-\n\s]{2,}', color)[0].strip()
                 if len(color) >= 2: return color
         return None
@@ -112,32 +116,35 @@ class HyundaiParser(InvoiceParser):
         vehicles = []
         vin_hits = []
         seen_vins = set()
+        # Checked once: the per-line debug below must cost nothing when disabled
+        debug = logger.isEnabledFor(logging.DEBUG)
         
         for page_idx, page in enumerate(pages_data):
+            index = TextIndex.of(page)
             # 1. Cluster items into lines by Y coordinate (Distance-based)
-            sorted_items = sorted(page, key=lambda x: x["y"])
+            order = sorted(range(len(index)), key=lambda i: index[i]["y"])
             lines_data = []
-            if sorted_items:
-                current_line = [sorted_items[0]]
-                for i in range(1, len(sorted_items)):
+            if order:
+                current_line = [order[0]]
+                for i in order[1:]:
                     # Merge if vertical gap is small (up to 25px is safer for car rows)
-                    if sorted_items[i]["y"] - current_line[-1]["y"] <= 25:
-                        current_line.append(sorted_items[i])
+                    if index[i]["y"] - index[current_line[-1]]["y"] <= 25:
+                        current_line.append(i)
                     else:
                         lines_data.append(current_line)
-                        current_line = [sorted_items[i]]
+                        current_line = [i]
                 lines_data.append(current_line)
 
             # 2. Analyze each merged line
-            for line_items in lines_data:
-                line_items.sort(key=lambda x: x["x"])
-                # Merge into a single string for fragment reconstruction
-                line_text = "".join([it["text"] for it in line_items]).upper().replace(" ", "")
-                # Normalize OCR errors
-                line_text = line_text.replace('O', '0').replace('I', '1').replace('Q', '0').replace('$', 'S')
+            for line_ids in lines_data:
+                line_ids.sort(key=lambda i: index[i]["x"])
+                line_items = [index[i] for i in line_ids]
+                # Merge the OCR-confusion folded codes (O->0, I->1, Q->0, $->S, no spaces)
+                # for fragment reconstruction
+                line_text = "".join(index.line_codes[i] for i in line_ids)
                 
-                if "MF3" in line_text:
-                    print(f"DEBUG MERGED LINE (len={len(line_text)}): {line_text}")
+                if debug and "MF3" in line_text:
+                    logger.debug("Merged line (len=%d): %s", len(line_text), line_text)
                 
                 # Use finditer with the flexible but non-greedy regex
                 for match in self.VIN_PATTERN.finditer(line_text):
@@ -150,14 +157,14 @@ class HyundaiParser(InvoiceParser):
                             "x": line_items[0]["x"],
                             "y": avg_y,
                             "page_idx": page_idx,
-                            "page_data": page
+                            "page_data": index
                         })
                         seen_vins.add(vin)
         
         # 3. Final VIN Hits Post-Processing
         # (Already handled by seen_vins and self._is_real_vin)
         vin_hits.sort(key=lambda x: (x["page_idx"], x["y"]))
-        print(f"DEBUG [Hyundai]: Total UNIQUE VIN anchors found: {len(vin_hits)}")
+        logger.debug("Hyundai unique VIN anchors found: %d", len(vin_hits))
 
         # 4. Data Association logic
         for hit in vin_hits:
@@ -170,18 +177,17 @@ class HyundaiParser(InvoiceParser):
             engine = None
             desc_items = []
             
-            for item in page:
+            for item, folded, compact in zip(page, page.line_folded, page.line_compact):
                 # Same row logic (+/- 55px from cluster center)
                 if abs(item["y"] - vy) <= 55:
                     # Engine extraction
-                    e = self._clean_engine(item["text"])
+                    e = self._clean_engine(compact)
                     if e and e != vin:
                         # Preference for 10-12 char alphanumeric strings
                         engine = e
                     
                     # Description extraction (exclude what we already know)
-                    it_txt = item["text"].upper()
-                    if not any(bl in it_txt for bl in self.VIN_BLACKLIST + self.ENGINE_BLACKLIST + ["STARGAZER X"]):
+                    if not any(bl in folded for bl in self.VIN_BLACKLIST + self.ENGINE_BLACKLIST + ["STARGAZER X"]):
                         if len(item["text"]) > 2 and item["x"] < vx + 100:
                             desc_items.append(item)
             
@@ -197,7 +203,5 @@ class HyundaiParser(InvoiceParser):
         return vehicles
 
     def _find_column_x(self, page_data, pattern):
-        for l in page_data:
-            if re.search(pattern, l["text"].upper().replace(" ", ""), re.I):
-                return l["x"]
-        return None
+        line = TextIndex.of(page_data).find_line(pattern, compact=True)
+        return line["x"] if line else None
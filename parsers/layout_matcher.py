@@ -0,0 +1,70 @@
+"""
+Layout Matcher - single-pass keyword automaton for layout dispatch
+"""
+from .text_index import fold_accents
+
+
+def fold_text(text: str) -> str:
+    """Uppercase and strip Vietnamese diacritics so keywords match OCR noise"""
+    return fold_accents(text)
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over folded keywords.
+    One scan of the document reports every keyword of every registered parser,
+    so the cost no longer grows with the number of brands.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._built = False
+
+    def add(self, keyword: str, payload):
+        node = 0
+        for ch in fold_text(keyword):
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(payload)
+        self._built = False
+
+    def build(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def find(self, folded_text: str) -> set:
+        """Return the set of payloads whose keyword occurs in already folded text"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = set()
+        node = 0
+        for ch in folded_text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                hits.update(out[node])
+        return hits
@@ -0,0 +1,159 @@
+"""
+Parser Registry - entry-point discovered, lazily imported layout parsers
+
+Plugins register under the "extrac_data.parsers" entry point group. Loading
+an entry point imports the module it names, so point it at a ParserSpec in
+a light module rather than at the parser class:
+
+    # kia_plugin/spec.py - no heavy imports
+    SPEC = ParserSpec("KIA", "kia_plugin.parser:KiaParser", ["KIA MOTORS", "THACO"])
+
+    [project.entry-points."extrac_data.parsers"]
+    KIA = "kia_plugin.spec:SPEC"
+
+Only the spec module is imported at discovery; the parser module is imported
+the first time its layout matches. An entry point naming a parser class
+works too, but imports it at discovery.
+"""
+import importlib
+import logging
+from importlib.metadata import entry_points
+
+from .layout_matcher import KeywordAutomaton, fold_text
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "extrac_data.parsers"
+
+
+class ParserSpec:
+    """
+    Lightweight description of a parser.
+    Only the keywords are needed for layout detection; the parser module
+    itself (``target`` = "module:Class" or the class) is imported on first use.
+    """
+
+    def __init__(self, name, target, keywords, min_hits=1):
+        self.name = name.upper()
+        self.target = target
+        self.keywords = tuple(keywords)
+        self.min_hits = min_hits
+
+    @classmethod
+    def from_class(cls, parser_cls, name=None):
+        name = name or getattr(parser_cls, "LAYOUT_NAME", None) \
+            or parser_cls.__name__.replace("Parser", "")
+        return cls(name, parser_cls, parser_cls.LAYOUT_KEYWORDS, parser_cls.LAYOUT_MIN_HITS)
+
+    def load(self):
+        if isinstance(self.target, str):
+            module_name, _, attr = self.target.partition(":")
+            return getattr(importlib.import_module(module_name), attr)
+        return self.target
+
+
+class ParserRegistry:
+    def __init__(self, discover=True):
+        self._specs = []
+        self._instances = {}
+        self._automaton = None
+        self._discover = discover
+        self._discovered = False
+
+    # ----------------------------------------------------
+    # Registration
+    # ----------------------------------------------------
+    def register(self, spec_or_class, name=None):
+        """Register a ParserSpec or an InvoiceParser subclass (registration order = tie-break priority)"""
+        spec = spec_or_class if isinstance(spec_or_class, ParserSpec) \
+            else ParserSpec.from_class(spec_or_class, name)
+        self._specs = [s for s in self._specs if s.name != spec.name]
+        self._specs.append(spec)
+        self._instances.pop(spec.name, None)
+        self._automaton = None
+        return spec
+
+    def _discover_entry_points(self):
+        if self._discovered or not self._discover:
+            return
+        self._discovered = True
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            try:
+                obj = ep.load()  # a ParserSpec (lazy) or a parser class (imported now)
+                self.register(obj, name=ep.name)
+            except Exception:
+                logger.warning("Failed to load parser plugin '%s'", ep.name, exc_info=True)
+
+    @property
+    def specs(self):
+        self._discover_entry_points()
+        return list(self._specs)
+
+    # ----------------------------------------------------
+    # Lookup
+    # ----------------------------------------------------
+    def get(self, name):
+        """Instantiate (once) and return the parser registered under ``name``"""
+        name = name.upper()
+        if name not in self._instances:
+            spec = next((s for s in self.specs if s.name == name), None)
+            if spec is None:
+                return None
+            self._instances[name] = spec.load()()
+        return self._instances[name]
+
+    def _get_automaton(self):
+        if self._automaton is None:
+            automaton = KeywordAutomaton()
+            for idx, spec in enumerate(self.specs):
+                for kw_idx, kw in enumerate(spec.keywords):
+                    automaton.add(kw, (idx, kw_idx))
+            automaton.build()
+            self._automaton = automaton
+        return self._automaton
+
+    def keyword_hits(self, text, folded=False):
+        """
+        Set of (layout index, keyword index) found in the text, from one pass.
+        Hits of several pages can be unioned and passed to detect_hits.
+        """
+        if not folded:
+            text = fold_text(text)
+        return self._get_automaton().find(text)
+
+    def score(self, text, folded=False):
+        """Number of distinct keywords hit per layout, from one pass over the text"""
+        return self._scores(self.keyword_hits(text, folded=folded))
+
+    def _scores(self, hits):
+        scores = {spec.name: 0 for spec in self._specs}
+        for idx, _ in hits:
+            scores[self._specs[idx].name] += 1
+        return scores
+
+    def detect(self, text, folded=False):
+        """Return (parser, layout_name) for the best-scoring eligible layout"""
+        return self.detect_hits(self.keyword_hits(text, folded=folded))
+
+    def detect_hits(self, hits):
+        """detect() from keyword hits already collected"""
+        scores = self._scores(hits)
+        best = None
+        for spec in self._specs:
+            s = scores[spec.name]
+            if s >= spec.min_hits and (best is None or s > scores[best.name]):
+                best = spec
+        if best is None:
+            return None, "UNKNOWN"
+        return self.get(best.name), best.name
+
+
+def default_registry():
+    """Registry with the built-in parsers followed by any installed plugins"""
+    from .hyundai_parser import HyundaiParser
+    from .vinfast_parser import VinFastParser
+
+    registry = ParserRegistry()
+    registry.register(HyundaiParser)
+    registry.register(VinFastParser)
+    return registry
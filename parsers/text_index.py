@@ -0,0 +1,141 @@
+"""
+Text Index - shared accent / OCR-confusion folded shadow text of a page
+
+Built once per page and matched by every parser and classifier:
+
+* ``folded``: uppercase, Vietnamese diacritics stripped, Đ -> D
+  ("Số khung" -> "SO KHUNG"), for labels and keywords.
+* ``line_codes``: folded, spaces removed and OCR look-alikes mapped the
+  way VINs never contain them (O -> 0, I -> 1, Q -> 0, $ -> S), for
+  identifiers.
+
+Folding is a single ``str.translate`` per table, done once per page: parsers
+take the page's TextIndex / FoldedText (or join pages' folds with
+FoldedText.join) instead of folding a re-joined document text again. A match on folded text is
+mapped back to the exact source characters (``source``) and to the OCR line
+holding it (``line_at``), so results keep the original spelling and boxes.
+"""
+import re
+import unicodedata
+from bisect import bisect_right
+
+
+def _build_accent_table():
+    table = {}
+    ranges = [range(0x61, 0x7B), range(0xC0, 0x250), range(0x1E00, 0x1F00)]
+    for cp in (c for r in ranges for c in r):
+        ch = chr(cp)
+        base = "".join(c for c in unicodedata.normalize("NFD", ch.upper())
+                       if unicodedata.category(c) != "Mn")
+        if base != ch:
+            table[cp] = base
+    # Decomposed input: drop the combining marks themselves
+    for cp in range(0x300, 0x370):
+        table[cp] = None
+    table[ord("Đ")] = table[ord("đ")] = "D"
+    return table
+
+
+ACCENT_FOLD = _build_accent_table()
+# Applied to folded text; VINs (ISO 3779) never contain I, O or Q
+OCR_CONFUSION_FOLD = str.maketrans({"O": "0", "I": "1", "Q": "0", "$": "S", " ": None})
+
+
+def fold_accents(text):
+    return text.translate(ACCENT_FOLD) if text else ""
+
+
+class FoldedText:
+    """A string and its folded shadow, with folded offsets mapped back to the source"""
+
+    def __init__(self, text):
+        self.text = text or ""
+        self.folded = self.text.translate(ACCENT_FOLD)
+        self._offsets = None
+
+    @classmethod
+    def of(cls, text):
+        """Reuse a FoldedText (or a TextIndex's page text), or fold a plain string"""
+        if isinstance(text, cls):
+            return text
+        if isinstance(text, TextIndex):
+            return text.page
+        return cls(text)
+
+    @classmethod
+    def join(cls, texts, folded, sep="\n"):
+        """``sep``.join of parts folded already (pages, lines), without translating again"""
+        joined = cls.__new__(cls)
+        joined.text = sep.join(texts)
+        joined.folded = sep.join(folded)
+        joined._offsets = None
+        return joined
+
+    def to_source(self, pos):
+        """Source offset of folded offset ``pos`` (identity unless folding changed lengths)"""
+        if len(self.folded) == len(self.text):
+            return pos
+        if self._offsets is None:
+            self._offsets = [i for i, ch in enumerate(self.text) for _ in range(len(ch.translate(ACCENT_FOLD)))]
+            self._offsets.append(len(self.text))
+        return self._offsets[pos]
+
+    def search(self, pattern, flags=0):
+        return re.search(pattern, self.folded, flags)
+
+    def source(self, match, group=0):
+        """Original text of a match (or group) found on ``folded``"""
+        start, end = match.span(group)
+        return self.text[self.to_source(start):self.to_source(end)]
+
+
+class TextIndex(list):
+    """
+    The OCR lines of one page ({"text", "x", "y"}), still usable as a plain
+    list, plus the page text and its folded forms per line.
+    """
+
+    def __init__(self, lines=()):
+        super().__init__(lines)
+        self.page = FoldedText("\n".join(l["text"] for l in self))
+        # Folding never adds or removes "\n", so folded lines align with self
+        self.line_folded = self.page.folded.split("\n") if self else []
+        self.line_compact = [f.replace(" ", "") for f in self.line_folded]
+        self.line_codes = [f.translate(OCR_CONFUSION_FOLD) for f in self.line_folded]
+        self._starts = []
+        pos = 0
+        for f in self.line_folded:
+            self._starts.append(pos)
+            pos += len(f) + 1
+
+    @classmethod
+    def of(cls, lines):
+        """Reuse an existing index (pages from OCRService) or build one"""
+        return lines if isinstance(lines, cls) else cls(lines)
+
+    @property
+    def text(self):
+        return self.page.text
+
+    @property
+    def folded(self):
+        return self.page.folded
+
+    def line_at(self, pos):
+        """OCR line (with its box) containing folded page offset ``pos``"""
+        return self[bisect_right(self._starts, pos) - 1]
+
+    @staticmethod
+    def join_lines(pages, sep=" "):
+        """FoldedText of every line of several pages joined by ``sep``, reusing each page's folds"""
+        indexes = [TextIndex.of(page) for page in pages]
+        return FoldedText.join([l["text"] for index in indexes for l in index],
+                               [f for index in indexes for f in index.line_folded], sep)
+
+    def find_line(self, pattern, compact=False):
+        """First line whose folded text (spaces removed if ``compact``) matches"""
+        texts = self.line_compact if compact else self.line_folded
+        for line, text in zip(self, texts):
+            if re.search(pattern, text):
+                return line
+        return None
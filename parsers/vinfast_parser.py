@@ -1,45 +1,49 @@
 """
 VinFast Invoice Parser - Text block-based extraction
 """
+import logging
 import re
 from .base_parser import InvoiceParser
+from .text_index import FoldedText, TextIndex
+
+logger = logging.getLogger(__name__)
 
 class VinFastParser(InvoiceParser):
+    LAYOUT_NAME = "VINFAST"
+    LAYOUT_KEYWORDS = ("VINFAST",)
+    LAYOUT_MIN_HITS = 1
+    RELEVANT_PAGE_TYPES = ("INVOICE",)
+
     def __init__(self):
         self.VIN_REGEX = re.compile(r'[A-HJ-NPR-Z0-9]{17}')
     
-    def can_handle(self, ocr_text: str) -> bool:
-        """Detect if this is a VinFast invoice"""
-        return bool(re.search(r'VINFAST', ocr_text, re.I))
-    
     def extract_invoice_number(self, text: str) -> str:
         """Extract VinFast invoice number from header only - Golden Principle #1 (Robust)"""
-        if not text: return None
+        text = FoldedText.of(text)
+        if not text.text: return None
         patterns = [
-            r'S.?\s*\((?:Inv|Invoice)\s*No\.?\)\s*[:\-]?\s*([A-Z0-9]{5,20})',
+            r'S.?\s*\((?:INV|INVOICE)\s*NO\.?\)\s*[:\-]?\s*([A-Z0-9]{5,20})',
             r'INV\s*NO\.?\s*[:\-]?\s*([A-Z0-9]{5,20})',
-            r'H[ÓO]A\s*[ĐD]ƠN.*?S.?\s*[:\-]?\s*([0-9]{5,20})'
+            r'HOA\s*DON.*?S.?\s*[:\-]?\s*([0-9]{5,20})'
         ]
         for pat in patterns:
-            m = re.search(pat, text, re.I | re.S | re.UNICODE)
-            if m:
-                num = m.group(1).strip()
-                if not num.upper().startswith(('VIN', 'SK', 'SM')):
-                    return num
+            m = text.search(pat, re.S)
+            if m and not m.group(1).startswith(('VIN', 'SK', 'SM')):
+                return text.source(m, 1).strip()
         return None
     
     def extract_color(self, pages_data: list) -> str:
         """Extract color from VinFast invoice"""
         if not pages_data: return None
-        full_text = " ".join([l["text"] for page in pages_data for l in page])
+        full_text = TextIndex.join_lines(pages_data)
         color_patterns = [
-            r'M[aà]u\s*s[oơ][n]\s*[:\-]?\s*([A-ZÀ-Ỹ ]{2,30})',
-            r'M[aà]u\s*s[aắ]c\s*[:\-]?\s*([A-ZÀ-Ỹ ]{2,30})'
+            r'MAU\s*SON\s*[:\-]?\s*([A-Z ]{2,30})',
+            r'MAU\s*SAC\s*[:\-]?\s*([A-Z ]{2,30})'
         ]
         for pat in color_patterns:
-            m = re.search(pat, full_text, re.I | re.UNICODE)
+            m = full_text.search(pat)
             if m:
-                color = m.group(1).strip()
+                color = full_text.source(m, 1).strip()
                 color = re.split(r'[,.\-\n]', color)[0].strip()
                 return color
         return None
@@ -60,10 +64,11 @@ class VinFastParser(InvoiceParser):
         
         # 1. Collect ALL valid VINs
         for page_idx, page in enumerate(pages_data):
-            for item in page:
-                txt = item["text"].replace(" ", "").upper()
+            page = TextIndex.of(page)
+            # VINs never contain I/O/Q, so match on the OCR-confusion folded codes
+            for item, code in zip(page, page.line_codes):
                 # VinFast often has "SK:" prefix, search for the 17-char VIN
-                match = re.search(r'([A-Z0-9]{17})', txt)
+                match = re.search(r'([A-Z0-9]{17})', code)
                 if match:
                     vin = match.group(1)
                     if self._is_real_vin(vin):
@@ -87,10 +92,10 @@ class VinFastParser(InvoiceParser):
             
             # A. Engine Assignment (within same page, ±80px Y)
             engine = None
-            for item in page:
+            for item, compact in zip(page, page.line_compact):
                 if abs(item["y"] - vy) <= 80:
                     # Look for SM: patterns
-                    sm_match = re.search(r'SM[:\- ]*([A-Z0-9]{6,20})', item["text"].replace(" ", "").upper())
+                    sm_match = re.search(r'SM[:\- ]*([A-Z0-9]{6,20})', compact)
                     if sm_match:
                         engine = sm_match.group(1)
                         break
@@ -98,13 +103,14 @@ class VinFastParser(InvoiceParser):
             # B. Description Assignment (Back-trace from VIN pos)
             # Find lines above the VIN that look like vehicle names
             desc_items = []
-            for item in page:
+            for item, folded in zip(page, page.line_folded):
                 # Items slightly above or on the same line, to the left
                 if item["x"] < vx - 50 and -100 <= (vy - item["y"]) <= 30:
-                    txt = item["text"].upper()
                     # Filter noise
-                    if re.search(r'\d{1,3}(?:\.\d{3}){2,}', txt): continue 
-                    if txt in ["CÁI", "CAI", "CHIẾC", "CHIEC"]: continue
+                    if re.search(r'\d{1,3}(?:\.\d{3}){2,}', folded): continue 
+                    if folded in ("CAI", "CHIEC"): continue
+                    # Totals rows; accents matter here (CỘNG vs CÔNG TY), so the original text is checked
+                    txt = item["text"].upper()
                     if any(kw in txt for kw in ["CỘNG", "TIỀN", "THUẾ", "VAT", "TỔNG"]): continue
                     desc_items.append(item)
             
@@ -117,5 +123,5 @@ class VinFastParser(InvoiceParser):
                 "description_hint": description if description else vin
             })
             
-        print(f"DEBUG [VinFast]: VIN hits found: {len(vin_hits)}")
+        logger.debug("VinFast VIN hits found: %d", len(vin_hits))
         return vehicles
@@ -0,0 +1,68 @@
+"""
+Server-Sent Events plumbing for progressive extraction results.
+
+The extraction pipeline is blocking (OCR, parsers, LLM), so it runs in a
+background thread and pushes events into a queue; the response body is a
+plain generator draining that queue as ``text/event-stream`` frames. When
+the client disconnects the generator is closed, and the next ``emit`` in
+the producer raises StreamClosed so the pipeline stops early.
+"""
+import json
+import queue
+import threading
+
+from tracing import in_context
+
+# Seconds without an event before a keep-alive comment is sent (proxies
+# close idle connections while a long page is being OCR'd)
+HEARTBEAT_SECONDS = 15
+
+_END = object()
+
+
+class StreamClosed(Exception):
+    """The client went away; raised from emit() to abort the producer"""
+
+
+def format_sse(event, data):
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def stream_events(produce, heartbeat=HEARTBEAT_SECONDS):
+    """
+    Run ``produce(emit)`` in a thread and yield its events as SSE frames.
+    ``emit(event, data)`` may be called from any thread. An exception in
+    ``produce`` is sent as a final "error" event.
+    """
+    events = queue.Queue()
+    closed = threading.Event()
+
+    def emit(event, data):
+        if closed.is_set():
+            raise StreamClosed()
+        events.put((event, data))
+
+    def run():
+        try:
+            produce(emit)
+        except StreamClosed:
+            pass
+        except Exception as e:
+            events.put(("error", {"message": str(e)}))
+        finally:
+            events.put(_END)
+
+    threading.Thread(target=in_context(run), daemon=True).start()
+    try:
+        while True:
+            try:
+                item = events.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is _END:
+                return
+            yield format_sse(*item)
+    finally:
+        closed.set()
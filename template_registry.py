@@ -0,0 +1,183 @@
+"""
+Template Registry - region-only OCR for known fixed-layout pages
+
+Quality certificates in Hyundai bundles share one layout across thousands of
+documents; only a few fields (VIN, engine number, color) change. A template
+stores the page's perceptual hash, its static text lines and the boxes of
+its variable fields. A page whose hash matches a template is OCR'd only in
+those boxes, and the result is returned together with the static lines as
+if it came from a full-page OCR. Unknown layouts fall back to full OCR.
+
+Register a template from a sample page:
+
+    python -m template_registry register sample.pdf --page 1 --name hyundai_cert_v1 \
+        --field VIN=0.12,0.30,0.55,0.34 --field ENGINE=0.12,0.35,0.55,0.39
+
+Field boxes are x0,y0,x1,y1 as fractions of the page width/height. OCR lines
+on a field's rows that start left of its right edge are dropped from the
+static text, so draw the box around a value's label too ("Số khung: ...").
+"""
+import argparse
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8
+# Max differing hash bits for a page to count as the template's layout
+MAX_DISTANCE = int(os.getenv("TEMPLATE_MAX_DISTANCE", "6"))
+
+
+def page_fingerprint(image):
+    """64-bit DCT perceptual hash of a 32x32 grayscale thumbnail"""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(gray, (HASH_SIZE * 4, HASH_SIZE * 4), interpolation=cv2.INTER_AREA)
+    dct = cv2.dct(thumb.astype(np.float32))[:HASH_SIZE, :HASH_SIZE].ravel()
+    low = dct[1:]  # skip the DC term (overall brightness)
+    bits = np.concatenate([[False], low > np.median(low)])
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PageTemplate:
+    def __init__(self, name, fingerprint, fields, static_lines, page_type=None):
+        self.name = name
+        self.fingerprint = fingerprint
+        self.fields = fields              # {field name: [x0, y0, x1, y1]} relative
+        self.static_lines = static_lines  # [{"text", "x", "y"}] relative coordinates
+        self.page_type = page_type
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "fingerprint": f"{self.fingerprint:016x}",
+            "page_type": self.page_type,
+            "fields": self.fields,
+            "static_lines": self.static_lines,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["name"], int(d["fingerprint"], 16), d["fields"], d["static_lines"], d.get("page_type"))
+
+    def field_boxes(self, width, height):
+        """Field boxes in pixels for a page of the given size"""
+        return {
+            name: (int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height))
+            for name, (x0, y0, x1, y1) in self.fields.items()
+        }
+
+
+def _may_overlap(x, y, box):
+    """
+    Whether a line starting at ``x`` (left edge) on row ``y`` may reach into
+    the field box. Lines carry no right edge, so a line on the field's rows
+    starting left of it ("So khung: MF3...") counts as overlapping: keeping it
+    would replay the sample's value as static text on every matched page.
+    """
+    x0, y0, x1, y1 = box
+    return y0 <= y <= y1 and x <= x1
+
+
+class TemplateRegistry:
+    def __init__(self, path=None):
+        self.path = path or os.getenv("TEMPLATE_REGISTRY_PATH", "templates/templates.json")
+        self.templates = []
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.templates = [PageTemplate.from_dict(d) for d in json.load(f)]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump([t.to_dict() for t in self.templates], f, ensure_ascii=False, indent=1)
+
+    def match(self, image, fingerprint=None):
+        """Closest template within MAX_DISTANCE bits, or None"""
+        if not self.templates:
+            return None
+        fp = page_fingerprint(image) if fingerprint is None else fingerprint
+        best = min(self.templates, key=lambda t: hamming(t.fingerprint, fp))
+        return best if hamming(best.fingerprint, fp) <= MAX_DISTANCE else None
+
+    def register(self, name, image, lines, fields, page_type=None):
+        """
+        Create a template from one OCR'd sample page.
+        ``fields``: {name: (x0, y0, x1, y1)} relative boxes of the variable fields;
+        every OCR line clear of them is kept as static text.
+        """
+        h, w = image.shape[:2]
+        static = [
+            {"text": l["text"], "x": l["x"] / w, "y": l["y"] / h}
+            for l in lines
+            if not any(_may_overlap(l["x"] / w, l["y"] / h, box) for box in fields.values())
+        ]
+        template = PageTemplate(name, page_fingerprint(image), {k: list(v) for k, v in fields.items()},
+                                static, page_type)
+        self.templates = [t for t in self.templates if t.name != name] + [template]
+        return template
+
+
+def ocr_with_template(template, image, ocr_region):
+    """
+    OCR only the template's field regions. ``ocr_region(crop)`` returns lines
+    in crop coordinates; they are shifted back to page coordinates and merged
+    with the static lines. Returns None if a field comes back empty, so the
+    caller can fall back to full-page OCR.
+    """
+    h, w = image.shape[:2]
+    lines = [{"text": l["text"], "x": l["x"] * w, "y": l["y"] * h} for l in template.static_lines]
+    for name, (x0, y0, x1, y1) in template.field_boxes(w, h).items():
+        field_lines = ocr_region(image[y0:y1, x0:x1])
+        if not field_lines:
+            return None
+        lines += [{"text": l["text"], "x": l["x"] + x0, "y": l["y"] + y0} for l in field_lines]
+    return lines
+
+
+def _parse_field(spec):
+    name, _, box = spec.partition("=")
+    coords = [float(v) for v in box.split(",")]
+    if len(coords) != 4:
+        raise argparse.ArgumentTypeError(f"Bad field box: {spec}")
+    return name, coords
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m template_registry")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    reg = sub.add_parser("register", help="Register a page layout as a template")
+    reg.add_argument("pdf")
+    reg.add_argument("--page", type=int, default=1)
+    reg.add_argument("--name", required=True)
+    reg.add_argument("--field", type=_parse_field, action="append", required=True, help="NAME=x0,y0,x1,y1")
+    reg.add_argument("--registry", default=None)
+    sub.add_parser("list", help="List registered templates").add_argument("--registry", default=None)
+    args = ap.parse_args(argv)
+
+    registry = TemplateRegistry(args.registry)
+    if args.cmd == "list":
+        for t in registry.templates:
+            print(f"{t.name}\t{t.fingerprint:016x}\t{t.page_type}\tfields={list(t.fields)}")
+        return 0
+
+    from ocr_service import OCRService
+    service = OCRService(poppler_path=os.getenv("POPPLER_PATH"))
+    _, img = next(service.iter_page_images(args.pdf, [args.page]))
+    image = service._to_bgr(img)
+    lines = service.ocr_page(image)
+    template = registry.register(args.name, image, lines, dict(args.field),
+                                 page_type=service.classify_page(lines))
+    registry.save()
+    print(f"Registered {template.name} ({template.fingerprint:016x}): "
+          f"{len(template.static_lines)} static lines, fields {list(template.fields)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from admission import JOB_BASE_BYTES, MemoryBudget, page_bytes
+
+A4 = (595.0, 842.0)
+
+
+def test_small_job_keeps_full_quality():
+    budget = MemoryBudget(4 * 2**30, resident_pages=4)
+    plan = budget.plan([A4] * 10)
+    assert (plan.dpi, plan.resident_pages, plan.downgraded) == (300, 4, False)
+    assert plan.estimated_bytes == JOB_BASE_BYTES + 4 * page_bytes(A4, 300)
+
+
+def test_oversized_job_is_downgraded():
+    budget = MemoryBudget(JOB_BASE_BYTES + page_bytes(A4, 200), resident_pages=4)
+    plan = budget.plan([A4] * 150)
+    assert plan.downgraded and plan.resident_pages == 1 and plan.dpi == 200
+
+    tiny = MemoryBudget(JOB_BASE_BYTES, resident_pages=4)
+    plan = tiny.plan([A4])
+    assert plan.dpi == 150 and plan.estimated_bytes == tiny.budget_bytes
+
+
+def test_jobs_queue_until_budget_frees():
+    budget = MemoryBudget(JOB_BASE_BYTES + 4 * page_bytes(A4, 300), resident_pages=4)
+    plan = budget.plan([A4] * 4)
+    assert budget.acquire(plan) < 0.1
+
+    waited = []
+    t = threading.Thread(target=lambda: waited.append(budget.acquire(plan)))
+    t.start()
+    time.sleep(0.2)
+    assert budget.stats()["queued"] == 1 and budget.stats()["running"] == 1
+    budget.release(plan)
+    t.join(2)
+    assert waited and waited[0] >= 0.15
+    budget.release(plan)
+    assert budget.stats()["used_mb"] == 0 and budget.stats()["admitted"] == 2
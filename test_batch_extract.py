@@ -0,0 +1,37 @@
+import json
+
+import os
+
+from batch_extract import dump_pages, dump_paths, find_pdfs, load_done
+
+
+def test_find_pdfs_expands_dirs_and_globs(tmp_path):
+    (tmp_path / "a").mkdir()
+    for name in ["a/1.pdf", "a/2.PDF", "a/note.txt", "3.pdf"]:
+        (tmp_path / name).write_bytes(b"%PDF")
+    assert [p.rsplit("/", 1)[1] for p in find_pdfs([str(tmp_path / "a")])] == ["1.pdf", "2.PDF"]
+    assert len(find_pdfs([str(tmp_path / "a"), str(tmp_path / "*.pdf"), str(tmp_path / "3.pdf")])) == 3
+
+
+def test_load_done_skips_errors_and_truncated_lines(tmp_path):
+    out = tmp_path / "results.jsonl"
+    out.write_text(
+        json.dumps({"file": "/x/1.pdf", "status": "success"}) + "\n"
+        + json.dumps({"file": "/x/2.pdf", "status": "error"}) + "\n"
+        + '{"file": "/x/3.pdf", "sta',
+        encoding="utf-8",
+    )
+    assert load_done(str(out)) == {"/x/1.pdf"}
+    assert load_done(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_dump_paths_keep_same_named_files_apart(tmp_path):
+    pdfs = ["/scans/2024/01/invoice.pdf", "/scans/2024/02/invoice.pdf", "/scans/2024/x.pdf"]
+    dumps = dump_paths(pdfs, str(tmp_path))
+    assert sorted(os.path.relpath(d, tmp_path) for d in dumps.values()) == \
+        ["01/invoice.ocr.txt", "02/invoice.ocr.txt", "x.ocr.txt"]
+    assert dump_paths(pdfs[:1], "d") == {pdfs[0]: os.path.join("d", "invoice.ocr.txt")}
+
+    dump_pages([{"index": 0, "type": "INVOICE", "lines": [{"text": "HD", "x": 1.0, "y": 2.0}]}],
+               dumps[pdfs[0]])
+    assert (tmp_path / "01" / "invoice.ocr.txt").read_text(encoding="utf-8") == "P0|INVOICE|Y2.0|X1.0|HD\n"
@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+import time
+
+from checkpoint_store import CheckpointStore, decode_page, encode_page
+
+
+LINES = [
+    {"text": "HÓA ĐƠN GIÁ TRỊ GIA TĂNG", "x": 862.0, "y": 196.0},
+    {"text": "Số (Invoice No): 0000554", "x": 1783.0, "y": 338.5},
+    {"text": "", "x": 1.5, "y": 2.5},
+]
+
+
+def test_page_record_roundtrip():
+    page = decode_page(encode_page(3, "INVOICE", LINES))
+    assert page["index"] == 3 and page["type"] == "INVOICE"
+    assert page["lines"] == LINES
+
+
+def test_record_is_compact():
+    lines = [{"text": f"MF3NA81DESJ0780{i:02d} G4LC123456", "x": 100.0, "y": 20.0 * i} for i in range(200)]
+    assert len(encode_page(1, "INVOICE", lines)) < len(json.dumps(lines)) / 3
+
+
+def test_job_resume_and_status(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    job = store.open_job("abc123")
+    job.update_manifest(status="running", pages_total=3)
+    job.save_page(2, "CERTIFICATE", LINES)
+    job.save_page(1, "INVOICE", LINES[:1])
+
+    # A new store instance (e.g. after a worker restart) sees the same progress
+    job = CheckpointStore(str(tmp_path)).open_job("abc123")
+    assert job.completed_pages() == [1, 2]
+    status = job.status()
+    assert status["status"] == "running" and status["pages_completed"] == 2
+    assert [p["type"] for p in status["pages"]] == ["INVOICE", "CERTIFICATE"]
+    assert "lines" not in status["pages"][0]
+    assert job.load_page(2)["lines"] == LINES
+
+    store.discard("abc123")
+    assert not store.exists("abc123")
+
+
+def test_concurrent_manifest_updates(tmp_path):
+    job = CheckpointStore(str(tmp_path)).open_job("same-pdf")
+    errors = []
+
+    def update(i):
+        try:
+            for n in range(20):
+                job.update_manifest(**{f"worker_{i}": n})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    manifest = job.read_manifest()
+    assert all(manifest[f"worker_{i}"] == 19 for i in range(8))
+    assert not [n for n in os.listdir(job.path) if n.endswith(".tmp")]
+
+
+def test_prune_removes_stale_jobs(tmp_path):
+    store = CheckpointStore(str(tmp_path), retention_hours=1)
+    store.open_job("old").save_page(1, "INVOICE", LINES)
+    store.open_job("fresh").save_page(1, "INVOICE", LINES)
+    stale = time.time() - 2 * 3600
+    os.utime(os.path.join(str(tmp_path), "old"), (stale, stale))
+    assert store.prune() == ["old"]
+    assert not store.exists("old") and store.exists("fresh")
@@ -0,0 +1,90 @@
+import pytest
+
+from document_splitter import DocumentSplitter, has_invoice_header, invoice_key, split_documents
+from parsers import default_registry
+
+
+def _page(index, page_type, header_no=None, body="noi dung"):
+    lines = []
+    if header_no is not None:
+        lines.append({"text": "HÓA ĐƠN GIÁ TRỊ GIA TĂNG", "x": 800, "y": 100})
+        lines.append({"text": f"Số (Invoice No): {header_no}", "x": 1700, "y": 200})
+    lines.append({"text": "HYUNDAI THANH CONG - Số khung", "x": 100, "y": 1500})
+    lines.append({"text": body, "x": 100, "y": 3000})
+    return {"index": index, "type": page_type, "lines": lines,
+            "text": "\n".join(l["text"] for l in lines)}
+
+
+def test_header_only_counts_near_top():
+    assert has_invoice_header(_page(1, "INVOICE", "0000554")["lines"])
+    lines = [{"text": "x", "x": 0, "y": 0}, {"text": "INVOICE", "x": 0, "y": 900}, {"text": "y", "x": 0, "y": 1000}]
+    assert not has_invoice_header(lines)
+
+
+def test_single_invoice_with_continuation():
+    pages = [_page(1, "INVOICE", "0000554"), _page(2, "INVOICE"), _page(3, "INVOICE", "0000554")]
+    segments = split_documents(pages, default_registry())
+    assert len(segments) == 1
+    assert segments[0]["invoice_no"] == "0000554"
+    assert [p["index"] for p in segments[0]["pages"]] == [1, 2, 3]
+
+
+def test_leading_supporting_pages_attach_to_next_invoice():
+    pages = [
+        _page(1, "CERTIFICATE"), _page(2, "OTHER"), _page(3, "INVOICE", "0000554"), _page(4, "INVOICE"),
+        _page(5, "CERTIFICATE"), _page(6, "INVOICE", "0000555"),
+    ]
+    segments = split_documents(pages, default_registry())
+    assert [s["invoice_no"] for s in segments] == ["0000554", "0000555"]
+    assert [[p["index"] for p in s["pages"]] for s in segments] == [[1, 2, 3, 4], [5, 6]]
+
+
+def test_trailing_supporting_pages_attach_to_previous_invoice():
+    pages = [
+        _page(1, "INVOICE", "0000554"), _page(2, "CERTIFICATE"),
+        _page(3, "INVOICE", "0000555"), _page(4, "CERTIFICATE"),
+    ]
+    segments = split_documents(pages, default_registry())
+    assert [[p["index"] for p in s["pages"]] for s in segments] == [[1, 2], [3, 4]]
+
+
+def test_ocr_misread_number_does_not_split_invoice():
+    # Page 3's header reads the leading 0 as an O
+    pages = [_page(1, "INVOICE", "0000554"), _page(2, "INVOICE"), _page(3, "INVOICE", "O000554")]
+    segments = split_documents(pages, default_registry())
+    assert [s["invoice_no"] for s in segments] == ["0000554"]
+    assert invoice_key("O000554") == invoice_key("0000554") != invoice_key("0000555")
+
+
+def test_splitter_holds_leading_supporting_pages_until_their_invoice():
+    splitter = DocumentSplitter(default_registry())
+    assert splitter.add(_page(1, "CERTIFICATE")) == []
+    joined = splitter.add(_page(2, "INVOICE", "0000554"))
+    assert [p["index"] for p in joined] == [1, 2] and splitter.current["invoice_no"] == "0000554"
+    assert splitter.add(_page(3, "CERTIFICATE")) == []
+    assert [p["index"] for p in splitter.add(_page(4, "INVOICE", "0000555"))] == [3, 4]
+    assert splitter.add(_page(5, "CERTIFICATE")) == []
+    assert [p["index"] for p in splitter.flush()] == [5]
+    assert [s["invoice_no"] for s in splitter.segments] == ["0000554", "0000555"]
+
+
+def test_stream_stamps_vehicles_with_their_own_invoice():
+    ocr_service = pytest.importorskip("ocr_service")
+    from parsers.text_index import TextIndex
+
+    def page(index, header_no, vin):
+        p = _page(index, "INVOICE", header_no, body=f"Số khung: {vin} Số máy: G4FLSQ508212")
+        p["lines"] = TextIndex(p["lines"])
+        return dict(p, folded=p["lines"].folded, rotation=0, template=None)
+
+    service = ocr_service.OCRService()
+    # Out of order, as checkpointed / queued pages can arrive
+    pages = [page(2, "0000555", "MF3NA81DESJ078222"), page(1, "0000554", "MF3NA81DESJ078111")]
+    service.iter_ocr_pages = lambda *a, **k: iter(pages)
+    service._finish_pages = lambda *a: None
+    service.extract_invoices = lambda pages: []
+    events = [(e, d) for e, d in service.iter_extraction_events("x.pdf") if e in ("invoice_number", "vehicle")]
+    assert [(e, d.get("invoice_no") or d["invoice_no_from_header"], d["page"]) for e, d in events] == [
+        ("invoice_number", "0000554", 1), ("vehicle", "0000554", 1),
+        ("invoice_number", "0000555", 2), ("vehicle", "0000555", 2),
+    ]
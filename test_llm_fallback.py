@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("ollama")
+
+from llm_service import _parse_description_fallback
+
+
+def test_color_is_not_taken_from_form_code():
+    _, color, _ = _parse_description_fallback("Xe ô tô con Hyundai Stargazer, Mẫu VAQ18-01, Màu Trắng")
+    assert color == "Trắng"
+
+
+@pytest.mark.parametrize("hint, seats", [
+    ("STARGAZER X 1.5 chọn gói 7 chỗ", "7"),
+    ("Xe tải Hyundai 2 chở hàng", None),
+    ("Xe ô tô con Hyundai Creta 5 chỗ Màu Đỏ", "5"),
+])
+def test_seats_only_from_cho(hint, seats):
+    assert _parse_description_fallback(hint)[2] == seats
+
+
+def test_description_matches_accented_hint():
+    desc, _, _ = _parse_description_fallback("Xe ô tô con Hyundai Stargazer 7 chỗ Màu Trắng; SK: MF3")
+    assert desc.startswith("Xe ô tô con Hyundai Stargazer 7 ch")
@@ -0,0 +1,43 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from load_test import FakeOllama, percentile, unique_copy
+
+
+def _chat(url, prompt):
+    body = json.dumps({"model": "llama3:8b", "messages": [{"role": "user", "content": prompt}]}).encode()
+    req = urllib.request.Request(f"{url}/api/chat", body, {"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def test_fake_ollama_echoes_verified_vehicles():
+    fake = FakeOllama(latency=0, tokens_per_sec=1e6).start()
+    try:
+        verified = [{"chassis_number": "MF3NA81DESJ078013", "engine_number": "G4LCNU123456",
+                     "invoice_no_from_header": "0000554"}]
+        prompt = f"VERIFIED LIST (Target vehicles):\n{json.dumps(verified)}\n\nREFERENCE OCR TEXT"
+        content = json.loads(_chat(fake.url, prompt)["message"]["content"])
+        assert content["invoice_number"] == "0000554"
+        assert [v["chassis_number"] for v in content["vehicle_list"]] == ["MF3NA81DESJ078013"]
+    finally:
+        fake.stop()
+
+
+def test_fake_ollama_error_rate():
+    fake = FakeOllama(latency=0, error_rate=1.0).start()
+    try:
+        with pytest.raises(urllib.error.HTTPError):
+            _chat(fake.url, "hi")
+        assert fake.errors == 1
+    finally:
+        fake.stop()
+
+
+def test_percentile_and_unique_uploads():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5], 99) == 5
+    assert unique_copy(b"%PDF") != unique_copy(b"%PDF")
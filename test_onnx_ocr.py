@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from onnx_ocr import OnnxOCR, _order_points
+
+
+def test_ctc_decode_collapses_repeats_and_blanks():
+    rec = OnnxOCR.__new__(OnnxOCR)
+    rec.charset = ["blank", "M", "F", "3", " "]
+    steps = [1, 1, 0, 2, 0, 3, 3]  # M M _ F _ 3 3
+    probs = np.full((len(steps), 5), 0.01, np.float32)
+    probs[np.arange(len(steps)), steps] = 0.9
+    text, score = rec._ctc_decode(probs)
+    assert text == "MF3" and score == pytest.approx(0.9)
+
+
+def test_order_points_matches_paddle_box_order():
+    box = np.array([[10, 20], [0, 20], [0, 0], [10, 0]], np.float32)
+    assert _order_points(box).tolist() == [[0, 0], [10, 0], [10, 20], [0, 20]]
+
+
+def test_long_lines_are_not_squeezed_to_base_width():
+    from onnx_ocr import REC_BASE_WIDTH, rec_batch_width, rec_widths
+    # ~40 characters: "Số khung (Chassis No): MF3NA81DESJ078110"
+    long_line = np.zeros((40, 1000, 3), np.uint8)
+    short = np.zeros((40, 100, 3), np.uint8)
+    widths = rec_widths([long_line, short])
+    assert widths == [1200, 120]
+    assert rec_batch_width(widths) == 1200
+    assert rec_batch_width([120]) == REC_BASE_WIDTH
@@ -0,0 +1,112 @@
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+import os
+import re
+
+from orientation import detect_orientation, rotate
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "uploads", "5f758e0a-69b3-4164-ad49-a4aad09c1e71.pdf")
+
+
+def _page():
+    """Synthetic upright page: lines of text with ascenders and diacritics"""
+    img = np.full((1600, 1200, 3), 255, np.uint8)
+    for i, y in enumerate(range(120, 1500, 60)):
+        cv2.putText(img, "Hoa don khung Thanh Cong bdfhklt", (60, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    return img
+
+
+@pytest.mark.parametrize("angle", [0, 90, 180, 270])
+def test_detects_rotation_without_probe(angle):
+    # A page scanned rotated by (360 - angle) needs `angle` to be upright again
+    scanned = rotate(_page(), (360 - angle) % 360)
+    assert detect_orientation(scanned)[0] == angle
+
+
+def _table_page(rows, row_h, cols, header):
+    """Synthetic invoice item table: ruled grid with one short text line per row"""
+    img = np.full((1600, 1200, 3), 255, np.uint8)
+    for i in range(header):
+        cv2.putText(img, "Hoa don gia tri gia tang", (60, 100 + 60 * i), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    top = 120 + 60 * header
+    bottom = top + rows * row_h
+    for y in range(top, bottom + 1, row_h):
+        cv2.line(img, (50, y), (1150, y), (0, 0, 0), 3)
+    for x in cols:
+        cv2.line(img, (x, top), (x, bottom), (0, 0, 0), 3)
+    for y in range(top + row_h - 22, bottom, row_h):
+        for x, text in ((80, "1"), (165, "Xe oto Hyundai 7 cho"), (610, "MF3NA81"), (910, "G4FLSQ")):
+            cv2.putText(img, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    return img
+
+
+GRID = (50, 120, 300, 450, 600, 750, 900, 1050, 1150)
+
+
+@pytest.mark.parametrize("angle", [90, 270])
+def test_table_rules_do_not_hide_sideways_page(angle):
+    # The column rules made the column profile of a sideways page look upright
+    scanned = rotate(_table_page(8, 100, GRID, 3), (360 - angle) % 360)
+    assert detect_orientation(scanned)[0] in (90, 270)
+
+
+def test_ambiguous_profiles_probe_zero_against_ninety():
+    scanned = rotate(_table_page(14, 70, GRID, 1), 270)
+    assert detect_orientation(scanned)[0] == 0  # profiles alone cannot tell
+
+    def probe(crop):
+        # A real text line is much wider than tall
+        return crop.shape[1] / crop.shape[0]
+
+    assert detect_orientation(scanned, probe)[0] in (90, 270)
+
+
+def test_ambiguous_page_without_probe_keeps_base():
+    img = np.full((1600, 1200, 3), 255, np.uint8)
+    for y in range(120, 1500, 60):
+        cv2.putText(img, "HOA DON GIA TRI GIA TANG", (60, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    assert detect_orientation(img) == (0, "profile")
+
+
+def _sample_page(number):
+    """Scanned page image of the repo's sample PDF (each page is one embedded JPEG)"""
+    with open(SAMPLE_PDF, "rb") as f:
+        data = f.read()
+    images = re.finditer(rb"/Subtype /Image .*?/Length (\d+).*?stream\r\n?", data, re.S)
+    m = [m for m in images][number - 1]
+    jpeg = np.frombuffer(data[m.end():m.end() + int(m.group(1))], np.uint8)
+    return cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+
+
+def _reading_probe(upright):
+    """Stands in for OCR: a crop "reads" well if it appears as is in the upright page"""
+    def small(img):
+        return cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), None, fx=0.25, fy=0.25)
+
+    page = small(upright)
+
+    def probe(crop):
+        crop = small(crop)
+        if crop.shape[0] > page.shape[0] or crop.shape[1] > page.shape[1]:
+            return 0.0
+        return float(cv2.matchTemplate(page, crop, cv2.TM_CCOEFF_NORMED).max())
+    return probe
+
+
+def test_sparse_rubbing_page_is_not_flipped():
+    # Page 2 (VIN / engine number rubbings) is stored sideways; two text
+    # lines and a stamp gave a strongly negative asymmetry -> 180
+    upright = rotate(_sample_page(2), 270)
+    assert detect_orientation(upright) == (0, "profile")
+    assert detect_orientation(upright, lambda crop: 0.5) == (0, "probe")
+
+
+@pytest.mark.parametrize("angle", [0, 90, 180, 270])
+def test_probe_confirms_rotation_of_sample_pages(angle):
+    for number, stored in ((1, 90), (2, 270), (3, 0)):
+        upright = rotate(_sample_page(number), stored)
+        scanned = rotate(upright, (360 - angle) % 360)
+        assert detect_orientation(scanned, _reading_probe(upright))[0] == angle, number
@@ -0,0 +1,109 @@
+import sys
+
+import pytest
+
+from parsers import HyundaiParser, InvoiceParser, ParserRegistry, ParserSpec, default_registry
+from parsers.layout_matcher import KeywordAutomaton, fold_text
+
+
+def test_fold_text_strips_accents():
+    assert fold_text("Số khung Đơn") == "SO KHUNG DON"
+
+
+def test_automaton_finds_overlapping_keywords():
+    ac = KeywordAutomaton()
+    for kw in ["HE", "SHE", "HIS", "HERS"]:
+        ac.add(kw, kw)
+    assert ac.find("USHERS") == {"HE", "SHE", "HERS"}
+
+
+def test_detect_builtin_layouts():
+    registry = default_registry()
+    parser, name = registry.detect("CONG TY HYUNDAI THANH CONG\nSố khung: MF3...")
+    assert name == "HYUNDAI" and isinstance(parser, HyundaiParser)
+    assert registry.detect("Công ty VinFast - hóa đơn")[1] == "VINFAST"
+    assert registry.detect("hóa đơn bán hàng") == (None, "UNKNOWN")
+
+
+def test_more_keyword_hits_beat_a_brand_mention():
+    # Hyundai hits "Số khung" and "Số máy" (2), VinFast only its name (1)
+    registry = default_registry()
+    assert registry.detect("VINFAST SỐ KHUNG SỐ MÁY")[1] == "HYUNDAI"
+
+
+def _parser(keyword):
+    class Parser(InvoiceParser):
+        LAYOUT_KEYWORDS = (keyword,)
+
+        def extract_vehicles(self, pages_data, full_text): return []
+        def extract_invoice_number(self, text): return None
+        def extract_color(self, pages_data): return None
+    return Parser
+
+
+def test_tie_goes_to_first_registered():
+    registry = ParserRegistry(discover=False)
+    registry.register(_parser("ALPHA"), name="FIRST")
+    registry.register(_parser("BETA"), name="SECOND")
+    assert registry.score("ALPHA BETA") == {"FIRST": 1, "SECOND": 1}
+    assert registry.detect("ALPHA BETA")[1] == "FIRST"
+
+
+def test_plugin_spec_is_imported_lazily():
+    registry = ParserRegistry(discover=False)
+    registry.register(ParserSpec("KIA", "no_such_module:KiaParser", ["KIA MOTORS", "THACO"], min_hits=1))
+    # Scoring only needs keywords; the target module is never imported
+    assert registry.score("THACO KIA MOTORS")["KIA"] == 2
+
+
+def test_register_parser_class():
+    class KiaParser(InvoiceParser):
+        LAYOUT_KEYWORDS = ("KIA",)
+
+        def extract_vehicles(self, pages_data, full_text): return []
+        def extract_invoice_number(self, text): return None
+        def extract_color(self, pages_data): return None
+
+    registry = ParserRegistry(discover=False)
+    registry.register(KiaParser)
+    parser, name = registry.detect("kia")
+    assert name == "KIA" and parser.can_handle("kia")
+
+
+def test_entry_point_spec_does_not_import_parser(tmp_path, monkeypatch):
+    # Fake installed distribution whose entry point names a ParserSpec
+    (tmp_path / "kia_spec.py").write_text(
+        "from parsers import ParserSpec\n"
+        "SPEC = ParserSpec('KIA', 'kia_heavy:KiaParser', ['KIA MOTORS', 'THACO'])\n")
+    (tmp_path / "kia_heavy.py").write_text("raise RuntimeError('imported at discovery')\n")
+    dist = tmp_path / "kia_plugin-1.0.dist-info"
+    dist.mkdir()
+    (dist / "METADATA").write_text("Metadata-Version: 2.1\nName: kia-plugin\nVersion: 1.0\n")
+    (dist / "entry_points.txt").write_text("[extrac_data.parsers]\nKIA = kia_spec:SPEC\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    registry = ParserRegistry()
+    assert registry.score("THACO KIA MOTORS")["KIA"] == 2
+    assert "kia_spec" in sys.modules and "kia_heavy" not in sys.modules
+    monkeypatch.delitem(sys.modules, "kia_spec")
+
+
+@pytest.mark.parametrize("text, page_type", [
+    ("HÓA ĐƠN GIÁ TRỊ GIA TĂNG", "INVOICE"),
+    ("PHIẾU KIỂM TRA CHẤT LƯỢNG XUẤT XƯỞNG", "CERTIFICATE"),
+    ("Biên bản bàn giao xe", "OTHER"),
+])
+def test_classify_page_matches_accented_headings(text, page_type):
+    # Before folding, accented headings ("HÓA ĐƠN", "PHIẾU KIỂM TRA") were OTHER
+    ocr_service = pytest.importorskip("ocr_service")
+    lines = [{"text": text, "x": 100, "y": 100}]
+    assert ocr_service.OCRService.classify_page(None, lines) == page_type
+
+
+def test_hits_of_separate_pages_add_up():
+    registry = default_registry()
+    first = registry.keyword_hits("CONG TY HYUNDAI", folded=True)
+    assert registry.detect_hits(first) == (None, "UNKNOWN")
+    # Same keyword on a later page is not counted twice
+    assert registry.detect_hits(first | registry.keyword_hits("HYUNDAI", folded=True)) == (None, "UNKNOWN")
+    assert registry.detect_hits(first | registry.keyword_hits("Số khung", folded=False))[1] == "HYUNDAI"
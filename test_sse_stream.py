@@ -0,0 +1,74 @@
+import json
+import threading
+
+from sse_stream import StreamClosed, format_sse, stream_events
+
+
+def parse(frames):
+    events = []
+    for frame in frames:
+        if frame.startswith(":"):
+            continue
+        head, data = frame.strip("\n").split("\n")
+        events.append((head[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_format_sse_keeps_unicode():
+    assert format_sse("layout", {"layout": "HYUNDAI THÀNH CÔNG"}) == \
+        'event: layout\ndata: {"layout": "HYUNDAI THÀNH CÔNG"}\n\n'
+
+
+def test_events_arrive_in_order_and_stream_ends():
+    def produce(emit):
+        emit("page", {"page": 1})
+        emit("vehicle", {"chassis_number": "KMHXX00XXXX000001"})
+        emit("done", {})
+
+    assert parse(stream_events(produce)) == [
+        ("page", {"page": 1}),
+        ("vehicle", {"chassis_number": "KMHXX00XXXX000001"}),
+        ("done", {}),
+    ]
+
+
+def test_producer_error_becomes_error_event():
+    def produce(emit):
+        emit("page", {"page": 1})
+        raise RuntimeError("ocr failed")
+
+    assert parse(stream_events(produce))[-1] == ("error", {"message": "ocr failed"})
+
+
+def test_heartbeat_while_producer_is_busy():
+    release = threading.Event()
+
+    def produce(emit):
+        release.wait(5)
+        emit("done", {})
+
+    stream = stream_events(produce, heartbeat=0.05)
+    assert next(stream) == ": keep-alive\n\n"
+    release.set()
+    assert parse(stream) == [("done", {})]
+
+
+def test_closing_the_stream_stops_the_producer():
+    first_read = threading.Event()
+    stopped = threading.Event()
+
+    def produce(emit):
+        try:
+            emit("page", {"page": 1})
+            first_read.wait(5)
+            while True:
+                emit("page", {"page": 2})
+        except StreamClosed:
+            stopped.set()
+            raise
+
+    stream = stream_events(produce)
+    next(stream)
+    stream.close()
+    first_read.set()
+    assert stopped.wait(5)
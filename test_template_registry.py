@@ -0,0 +1,62 @@
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+from template_registry import TemplateRegistry, ocr_with_template
+
+VIN_BOX = (0.1, 0.45, 0.7, 0.55)
+
+
+def _certificate(vin):
+    img = np.full((1400, 1000, 3), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (960, 1360), (0, 0, 0), 4)
+    cv2.putText(img, "PHIEU KIEM TRA CHAT LUONG", (120, 150), cv2.FONT_HERSHEY_SIMPLEX, 1.3, (0, 0, 0), 3)
+    for y in range(300, 1300, 120):
+        cv2.line(img, (40, y), (960, y), (0, 0, 0), 2)
+    cv2.putText(img, vin, (120, 700), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    return img
+
+
+def test_same_layout_matches_other_layout_does_not(tmp_path):
+    registry = TemplateRegistry(str(tmp_path / "t.json"))
+    lines = [{"text": "PHIEU KIEM TRA CHAT LUONG", "x": 120, "y": 140},
+             {"text": "MF3NA81DESJ078013", "x": 120, "y": 690}]
+    template = registry.register("cert", _certificate("MF3NA81DESJ078013"), lines, {"VIN": VIN_BOX})
+    assert [l["text"] for l in template.static_lines] == ["PHIEU KIEM TRA CHAT LUONG"]
+    registry.save()
+
+    registry = TemplateRegistry(str(tmp_path / "t.json"))
+    assert registry.match(_certificate("MF3NA81DESJ099999")).name == "cert"
+    other = np.full((1400, 1000, 3), 255, np.uint8)
+    cv2.rectangle(other, (500, 100), (950, 700), (0, 0, 0), -1)
+    assert registry.match(other) is None
+
+
+def test_field_lines_are_shifted_to_page_coordinates(tmp_path):
+    registry = TemplateRegistry(str(tmp_path / "t.json"))
+    page = _certificate("MF3NA81DESJ078013")
+    template = registry.register("cert", page, [{"text": "PHIEU", "x": 120, "y": 140}], {"VIN": VIN_BOX})
+
+    crops = []
+
+    def ocr_region(crop):
+        crops.append(crop.shape)
+        return [{"text": "MF3NA81DESJ099999", "x": 20.0, "y": 60.0}]
+
+    lines = ocr_with_template(template, page, ocr_region)
+    assert crops == [(140, 600, 3)]
+    assert lines == [{"text": "PHIEU", "x": 120.0, "y": 140.0},
+                     {"text": "MF3NA81DESJ099999", "x": 120.0, "y": 690.0}]
+    assert ocr_with_template(template, page, lambda crop: []) is None
+
+
+def test_line_running_into_a_field_is_not_static(tmp_path):
+    registry = TemplateRegistry(str(tmp_path / "t.json"))
+    page = _certificate("MF3NA81DESJ078013")
+    lines = [{"text": "PHIEU KIEM TRA CHAT LUONG", "x": 120, "y": 140},
+             # Label and sample VIN read as one line starting left of the VIN box
+             {"text": "So khung: MF3NA81DESJ078013", "x": 50, "y": 690},
+             {"text": "Ngay 01/02/2024", "x": 800, "y": 900}]
+    template = registry.register("cert", page, lines, {"VIN": VIN_BOX})
+    assert [l["text"] for l in template.static_lines] == ["PHIEU KIEM TRA CHAT LUONG", "Ngay 01/02/2024"]
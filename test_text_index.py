@@ -0,0 +1,67 @@
+import unicodedata
+
+from parsers import HyundaiParser
+from parsers.text_index import FoldedText, TextIndex, fold_accents
+
+
+def _lines(*texts):
+    return [{"text": t, "x": 10.0 * i, "y": 100.0 * i} for i, t in enumerate(texts)]
+
+
+def test_fold_accents_matches_vietnamese_labels():
+    assert fold_accents("Hóa đơn GIÁ TRỊ GIA TĂNG - Số khung - Màu sơn") == \
+        "HOA DON GIA TRI GIA TANG - SO KHUNG - MAU SON"
+
+
+def test_match_on_decomposed_text_maps_back_to_source():
+    text = FoldedText(unicodedata.normalize("NFD", "Màu sắc: Trắng ngọc"))
+    assert len(text.folded) < len(text.text)
+    m = text.search(r"MAU\s*SAC\s*:\s*([A-Z ]+)")
+    assert text.source(m, 1) == unicodedata.normalize("NFD", "Trắng ngọc")
+
+
+def test_line_at_points_to_source_box():
+    index = TextIndex(_lines("CÔNG TY HYUNDAI", "Số khung (Chassis No): MF3NA81DESJ078110"))
+    m = index.page.search(r"SO KHUNG")
+    assert index.line_at(m.start()) is index[1]
+    assert index.find_line(HyundaiParser().SK_PATTERN, compact=True) is index[1]
+
+
+def test_codes_fold_ocr_confusions_for_identifiers():
+    index = TextIndex(_lines("MF3NA81DES JO78II0", "$ố máy"))
+    assert index.line_codes == ["MF3NA81DESJ078110", "S0MAY"]
+    assert index.line_compact[0] == "MF3NA81DESJO78II0"
+
+
+def test_index_is_reused_and_parsers_accept_plain_lists():
+    index = TextIndex(_lines("a"))
+    assert TextIndex.of(index) is index
+
+    page = [{"text": "MF3NA81DES", "x": 100, "y": 500}, {"text": "JO78IIO", "x": 400, "y": 505},
+            {"text": "G4FLSQ5082", "x": 900, "y": 510}]
+    parser = HyundaiParser()
+    vehicles = parser.extract_vehicles([page], "")
+    assert [(v["chassis_number"], v["engine_number"]) for v in vehicles] == [("MF3NA81DESJ078110", "G4FLS05082")]
+    assert parser.extract_vehicles([TextIndex(page)], "") == vehicles
+
+
+def test_joined_pages_reuse_their_folds():
+    pages = [TextIndex(_lines("HÓA ĐƠN", "Số (Invoice No): 0000554")),
+             TextIndex(_lines(unicodedata.normalize("NFD", "Màu sơn: Trắng"), "Số khung"))]
+    joined = FoldedText.join([p.text for p in pages], [p.folded for p in pages])
+    whole = FoldedText("\n".join(p.text for p in pages))
+    assert (joined.text, joined.folded) == (whole.text, whole.folded)
+    m = joined.search(r"MAU SON: ([A-Z]+)")
+    assert joined.source(m, 1) == unicodedata.normalize("NFD", "Trắng")
+
+    lines = TextIndex.join_lines(pages)
+    assert lines.folded == fold_accents(" ".join(l["text"] for p in pages for l in p))
+    assert FoldedText.of(pages[0]) is pages[0].page and FoldedText.of(joined) is joined
+
+
+def test_parsers_take_a_page_index_or_plain_text():
+    page = TextIndex(_lines("HÓA ĐƠN GIÁ TRỊ GIA TĂNG", "Số (Invoice No): 0000554", "Màu sơn: TRẮNG"))
+    parser = HyundaiParser()
+    assert parser.extract_invoice_number(page) == parser.extract_invoice_number(page.text) == "0000554"
+    assert parser.extract_invoice_number(TextIndex()) is None
+    assert parser.extract_color([page]) == "TRẮNG"
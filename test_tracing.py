@@ -0,0 +1,39 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import JsonFormatter, _TraceFilter, current_trace_id, in_context, lazy, save_artifact, start_trace
+
+
+def test_lazy_payload_not_built_when_level_disabled(caplog):
+    calls = []
+    logger = logging.getLogger("test.lazy")
+    with caplog.at_level(logging.INFO, logger="test.lazy"):
+        logger.debug("payload %s", lazy(lambda: calls.append("debug") or "x"))
+        logger.info("payload %s", lazy(lambda: calls.append("info") or "y"))
+    assert "debug" not in calls and "info" in calls
+    assert caplog.records[-1].getMessage() == "payload y"
+
+
+def test_trace_id_reaches_worker_threads():
+    start_trace("abc123", sample_percent=0)
+    with ThreadPoolExecutor(2) as pool:
+        assert list(pool.map(in_context(lambda _: current_trace_id()), range(4))) == ["abc123"] * 4
+
+
+def test_json_formatter_includes_trace_and_extra():
+    start_trace("t-1", sample_percent=0)
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "hello %s", ("w",), None)
+    record.pages = 3
+    _TraceFilter().filter(record)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["trace_id"] == "t-1" and entry["msg"] == "hello w" and entry["pages"] == 3
+
+
+def test_artifacts_only_for_sampled_traces(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEBUG_ARTIFACT_DIR", str(tmp_path))
+    start_trace("skip", sample_percent=0)
+    assert save_artifact("prompt.txt", lambda: 1 / 0) is None
+    start_trace("keep", sample_percent=100)
+    path = save_artifact("lines.json", lambda: [{"text": "MF3"}])
+    assert json.load(open(path, encoding="utf-8")) == [{"text": "MF3"}]
@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from work_queue import SqliteWorkQueue, serve
+
+ctx = multiprocessing.get_context("fork")
+
+
+def _echo(task):
+    return f"{task.job_id}:{task.page}:{os.getpid()}".encode()
+
+
+def _run_worker(path, lease_seconds=0.5):
+    serve(SqliteWorkQueue(path), _echo, lease_seconds=lease_seconds, poll_interval=0.05, idle_exit=1.0)
+
+
+def _crash_on_first_task(path):
+    """Take a lease and die without completing or failing it"""
+    queue = SqliteWorkQueue(path)
+    while queue.lease("doomed", lease_seconds=0.3) is None:
+        time.sleep(0.01)
+    os._exit(1)
+
+
+def _slow(task):
+    time.sleep(1.0)
+    return b"slow"
+
+
+def _start(target, *args):
+    proc = ctx.Process(target=target, args=args)
+    proc.start()
+    return proc
+
+
+def test_worker_processes_drain_job(tmp_path):
+    path = str(tmp_path / "q.db")
+    queue = SqliteWorkQueue(path)
+    queue.submit("job1", [(n, {"pdf_path": "x.pdf"}) for n in range(1, 21)])
+    workers = [_start(_run_worker, path) for _ in range(4)]
+
+    results = dict(queue.iter_results("job1", range(1, 21), poll_interval=0.05, timeout=30))
+    for w in workers:
+        w.join(10)
+
+    assert sorted(results) == list(range(1, 21))
+    assert all(results[n].decode().startswith(f"job1:{n}:") for n in results)
+    assert queue.counts() == {"done": 20}
+
+
+def test_task_of_dead_worker_is_redelivered(tmp_path):
+    path = str(tmp_path / "q.db")
+    queue = SqliteWorkQueue(path)
+    queue.submit("job1", [(1, {})])
+    doomed = _start(_crash_on_first_task, path)
+    doomed.join(10)
+    assert doomed.exitcode == 1 and queue.counts() == {"leased": 1}
+
+    survivor = _start(_run_worker, path)
+    (page, result), = queue.iter_results("job1", [1], poll_interval=0.05, timeout=30)
+    survivor.join(10)
+    assert page == 1 and result.decode().split(":")[-1] == str(survivor.pid)
+
+
+def test_heartbeat_keeps_long_task_leased(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "q.db"))
+    queue.submit("job1", [(1, {})])
+    done = []
+    holder = threading.Thread(target=lambda: done.append(
+        serve(queue, _slow, worker_id="w1", lease_seconds=0.3, idle_exit=0)))
+    holder.start()
+    while queue.counts() != {"leased": 1}:
+        time.sleep(0.01)
+    # A second worker polls meanwhile; it only gets the task if the lease lapses
+    rival = _start(_run_worker, queue.path)
+    holder.join(10)
+    rival.join(10)
+    assert done == [1]
+    assert queue.finished("job1") == {1: (b"slow", None)}
+
+
+def test_stale_worker_result_is_dropped(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "q.db"))
+    queue.submit("job1", [(1, {})])
+    stale = queue.lease("w1", lease_seconds=0.01)
+    time.sleep(0.05)
+    fresh = queue.lease("w2")
+    assert fresh.attempts == 2
+    assert not queue.complete(stale, b"late")
+    assert queue.complete(fresh, b"ok")
+    assert queue.finished("job1") == {1: (b"ok", None)}
+
+
+def test_fails_after_max_attempts(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "q.db"), max_attempts=2)
+    queue.submit("job1", [(1, {}), (2, {})])
+    queue.submit("job1", [(1, {})])  # resubmitting a queued page is a no-op
+
+    def broken(task):
+        if task.page == 1:
+            raise ValueError("bad page")
+        return b"ok"
+
+    serve(queue, broken, worker_id="w1", idle_exit=0)
+    assert queue.counts() == {"done": 1, "failed": 1}
+    with pytest.raises(RuntimeError, match="bad page"):
+        list(queue.iter_results("job1", [1, 2], timeout=1))
+
+    queue.purge("job1")
+    assert queue.counts() == {}
+
+
+def test_finished_only_returns_requested_pages(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "q.db"))
+    queue.submit("job1", [(1, {"trace_id": "t-1"}), (2, {})])
+    serve(queue, _echo, worker_id="w1", idle_exit=0)
+    assert set(queue.finished("job1")) == {1, 2}
+    assert set(queue.finished("job1", {2})) == {2}
+    assert queue.finished("job1", set()) == {}
+
+
+def test_worker_continues_request_trace():
+    from checkpoint_store import decode_page
+    from ocr_worker import make_handler
+    from tracing import current_trace_id
+    from work_queue import Task
+
+    seen = []
+
+    class Service:
+        def iter_page_images(self, pdf_path, pages, batch_size=1):
+            yield pages[0], object()
+
+        def ocr_image(self, page_idx, img):
+            seen.append(current_trace_id())
+            return {"type": "INVOICE", "lines": [], "rotation": 0, "template": None}
+
+    task = Task(1, "job1-abcd", 3, {"pdf_path": "x.pdf", "trace_id": "req-42", "sampled": False}, 1, "w1")
+    page = decode_page(make_handler(Service())(task))
+    assert seen == ["req-42"] and page["index"] == 3 and page["type"] == "INVOICE"
@@ -0,0 +1,124 @@
+"""
+Logging + tracing - leveled structured logs with a per-request trace id
+
+    LOG_LEVEL=DEBUG LOG_FORMAT=json DEBUG_SAMPLE_PERCENT=5 uvicorn main:app
+
+Modules log through ``logging.getLogger(__name__)``; expensive debug payloads
+are passed as ``lazy(...)`` arguments (or guarded with ``isEnabledFor``) so a
+disabled level costs nothing. Every record carries the trace id of the
+request being processed. For DEBUG_SAMPLE_PERCENT % of traces, full debug
+artifacts (OCR lines, LLM prompt, raw LLM response) are saved under
+DEBUG_ARTIFACT_DIR/<trace_id>/.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+
+_trace_id = contextvars.ContextVar("trace_id", default="-")
+_sampled = contextvars.ContextVar("trace_sampled", default=False)
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "trace_id"}
+
+
+class lazy:
+    """Defer building a log argument until the record is actually formatted"""
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __str__(self):
+        return str(self.fn())
+
+
+# ----------------------------------------------------
+# Trace context
+# ----------------------------------------------------
+def start_trace(trace_id=None, sample_percent=None):
+    """Bind a trace id (and artifact sampling decision) to the current context"""
+    trace_id = trace_id or uuid.uuid4().hex[:16]
+    if sample_percent is None:
+        sample_percent = float(os.getenv("DEBUG_SAMPLE_PERCENT", "0"))
+    _trace_id.set(trace_id)
+    _sampled.set(sample_percent > 0 and random.random() * 100 < sample_percent)
+    return trace_id
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+def is_sampled():
+    return _sampled.get()
+
+
+def in_context(fn):
+    """Wrap ``fn`` so worker threads run it with the caller's trace context"""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+
+def save_artifact(name, build):
+    """Write a debug artifact for sampled traces only; ``build`` is not called otherwise"""
+    if not _sampled.get():
+        return None
+    directory = os.path.join(os.getenv("DEBUG_ARTIFACT_DIR", "debug_artifacts"), _trace_id.get())
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    payload = build()
+    if not isinstance(payload, str):
+        payload = json.dumps(payload, ensure_ascii=False, indent=1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(payload)
+    return path
+
+
+# ----------------------------------------------------
+# Logging setup
+# ----------------------------------------------------
+class _TraceFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = _trace_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """Idempotent root logger setup from LOG_LEVEL / LOG_FORMAT (text|json)"""
+    root = logging.getLogger()
+    if any(getattr(h, "_invoice_handler", False) for h in root.handlers):
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler._invoice_handler = True
+    handler.addFilter(_TraceFilter())
+    if (fmt or os.getenv("LOG_FORMAT", "text")).lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s")
+        formatter.converter = time.gmtime
+        handler.setFormatter(formatter)
+    root.addHandler(handler)
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
@@ -0,0 +1,272 @@
+"""
+Work Queue - durable page-level OCR tasks shared by stateless worker nodes
+
+The API node submits one task per page and collects the results; OCR
+workers (``python -m ocr_worker``) lease tasks, OCR them and complete them.
+A lease expires unless the worker heartbeats, so a task held by a dead
+worker is delivered again; after ``max_attempts`` deliveries it fails.
+
+SqliteWorkQueue is the local implementation: one database file shared by
+the API and worker processes / containers of a single host. It runs in WAL
+mode, which needs shared memory between the processes, so the file must not
+sit on a network filesystem mounted by several hosts. Workers on other hosts
+need a broker-backed queue, which only has to implement the WorkQueue methods.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+LEASE_SECONDS = float(os.getenv("WORK_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("WORK_MAX_ATTEMPTS", "3"))
+
+logger = logging.getLogger(__name__)
+
+
+class Task:
+    def __init__(self, task_id, job_id, page, payload, attempts, worker):
+        self.id = task_id
+        self.job_id = job_id
+        self.page = page
+        self.payload = payload
+        self.attempts = attempts
+        self.worker = worker
+
+
+class WorkQueue(ABC):
+    """Interface shared by the SQLite queue and any future broker"""
+
+    @abstractmethod
+    def submit(self, job_id, tasks):
+        """Enqueue ``[(page, payload dict), ...]``; pages already queued for the job are kept"""
+
+    @abstractmethod
+    def lease(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """Next deliverable Task (pending or lease expired), or None"""
+
+    @abstractmethod
+    def heartbeat(self, task, lease_seconds=LEASE_SECONDS):
+        """Extend the lease; False if the task is no longer held by this worker"""
+
+    @abstractmethod
+    def complete(self, task, result):
+        """Store the result bytes; False if the lease was lost (result dropped)"""
+
+    @abstractmethod
+    def fail(self, task, error):
+        """Give the task back for another attempt, or fail it after max_attempts"""
+
+    @abstractmethod
+    def finished(self, job_id, pages=None):
+        """{page: (result bytes or None, error or None)} for done / failed tasks (only ``pages`` if given)"""
+
+    @abstractmethod
+    def purge(self, job_id):
+        """Drop every task of the job"""
+
+    def iter_results(self, job_id, pages, poll_interval=0.2, timeout=None):
+        """
+        Yield (page, result) as each page of the job finishes, in completion
+        order. Raises RuntimeError if a page failed, TimeoutError if the job
+        does not finish within ``timeout`` seconds.
+        """
+        remaining = set(pages)
+        deadline = time.monotonic() + timeout if timeout else None
+        while remaining:
+            # Only pages not yielded yet: finished blobs are not reloaded on every poll
+            ready = self.finished(job_id, remaining)
+            for page in sorted(ready):
+                result, error = ready[page]
+                if error is not None:
+                    raise RuntimeError(f"Page {page} failed on OCR workers: {error}")
+                remaining.discard(page)
+                yield page, result
+            if not remaining:
+                return
+            if not ready:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"{len(remaining)} page(s) of job {job_id} not finished")
+                time.sleep(poll_interval)
+
+
+class SqliteWorkQueue(WorkQueue):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id      TEXT NOT NULL,
+            page        INTEGER NOT NULL,
+            payload     TEXT NOT NULL,
+            status      TEXT NOT NULL DEFAULT 'pending',
+            worker      TEXT,
+            lease_until REAL,
+            attempts    INTEGER NOT NULL DEFAULT 0,
+            result      BLOB,
+            error       TEXT,
+            UNIQUE (job_id, page)
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+    """
+
+    def __init__(self, path=None, max_attempts=MAX_ATTEMPTS):
+        self.path = path or os.getenv("WORK_QUEUE_PATH", "queue/work.db")
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as db:
+            # WAL: readers do not block the writer; single host only (see module docstring)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(self.SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per call: safe across threads and processes
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute("PRAGMA busy_timeout=30000")
+        return _Closing(db)
+
+    def submit(self, job_id, tasks):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (job_id, page, payload) VALUES (?, ?, ?)",
+                [(job_id, page, json.dumps(payload, ensure_ascii=False)) for page, payload in tasks],
+            )
+            db.execute("COMMIT")
+
+    def lease(self, worker_id, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            # Leases that expired on their last allowed attempt are not redelivered
+            db.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired ' || attempts || ' time(s)' "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT id, job_id, page, payload, attempts FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            task_id, job_id, page, payload, attempts = row
+            db.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, attempts + 1, task_id),
+            )
+            db.execute("COMMIT")
+        return Task(task_id, job_id, page, json.loads(payload), attempts + 1, worker_id)
+
+    def heartbeat(self, task, lease_seconds=LEASE_SECONDS):
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE tasks SET lease_until = ? WHERE id = ? AND status = 'leased' AND worker = ? AND attempts = ?",
+                (time.time() + lease_seconds, task.id, task.worker, task.attempts),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, task, result):
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_until = NULL "
+                "WHERE id = ? AND status = 'leased' AND worker = ? AND attempts = ?",
+                (sqlite3.Binary(result), task.id, task.worker, task.attempts),
+            )
+            return cur.rowcount == 1
+
+    def fail(self, task, error):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_until = NULL "
+                "WHERE id = ? AND status = 'leased' AND worker = ? AND attempts = ?",
+                (self.max_attempts, str(error), task.id, task.worker, task.attempts),
+            )
+
+    def finished(self, job_id, pages=None):
+        sql = "SELECT page, status, result, error FROM tasks WHERE job_id = ? AND status IN ('done', 'failed')"
+        args = [job_id]
+        if pages is not None:
+            pages = sorted(pages)
+            sql += f" AND page IN ({','.join('?' * len(pages))})"
+            args += pages
+        with self._connect() as db:
+            rows = db.execute(sql, args).fetchall()
+        return {page: (bytes(result) if status == "done" else None, None if status == "done" else error)
+                for page, status, result, error in rows}
+
+    def purge(self, job_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM tasks WHERE job_id = ?", (job_id,))
+
+    def counts(self):
+        """{status: task count}, for monitoring"""
+        with self._connect() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+
+class _Closing:
+    """sqlite3's own context manager commits but does not close"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def serve(queue, handle, worker_id=None, lease_seconds=LEASE_SECONDS, poll_interval=0.5,
+          stop=None, idle_exit=None):
+    """
+    Worker loop: lease a task, run ``handle(task) -> bytes``, complete it.
+    The lease is extended in the background while ``handle`` runs. Stops
+    when ``stop`` (threading.Event) is set, or after ``idle_exit`` seconds
+    without work. Returns the number of tasks completed.
+    """
+    worker_id = worker_id or default_worker_id()
+    stop = stop or threading.Event()
+    done = 0
+    idle_since = time.monotonic()
+    while not stop.is_set():
+        task = queue.lease(worker_id, lease_seconds)
+        if task is None:
+            if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                break
+            stop.wait(poll_interval)
+            continue
+
+        finished = threading.Event()
+
+        def keep_alive():
+            while not finished.wait(lease_seconds / 3):
+                if not queue.heartbeat(task, lease_seconds):
+                    return
+
+        threading.Thread(target=keep_alive, daemon=True).start()
+        try:
+            result = handle(task)
+        except Exception as e:
+            logger.exception("Task %s page %d failed (attempt %d)", task.job_id, task.page, task.attempts)
+            queue.fail(task, e)
+        else:
+            if queue.complete(task, result):
+                done += 1
+            else:
+                logger.warning("Lease lost for %s page %d; result dropped", task.job_id, task.page)
+        finally:
+            finished.set()
+        idle_since = time.monotonic()
+    return done